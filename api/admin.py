@@ -0,0 +1,140 @@
+from fastapi import Request, APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+import os
+import io
+import csv
+import json
+import hmac
+from datetime import datetime
+from typing import Optional
+import sys
+sys.path.append("..")
+from utils import iter_json_array
+from booking import DISPUTE_TYPES, TIME_SLOTS
+
+#实例化子路由对象
+api_admin = APIRouter()
+
+# ================= 配置区域 =================
+# 导出接口需要的口令（请求头 X-Admin-Token 或参数 token）；不配置则导出功能关闭
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+# ===========================================
+
+# 可导出的数据: 名称 -> (文件名, 按哪个字段筛选日期, CSV 列)
+DATASETS = {
+    "submissions": ("submissions.json", "submit_time", [
+        ("submit_time", "提交时间"), ("name", "姓名"), ("gender", "性别"), ("phone", "电话"),
+        ("is_secret", "是否保密"), ("address", "地址"), ("dispute_type", "纠纷类型"),
+        ("description", "纠纷描述"), ("evidence_files", "证据文件"),
+    ]),
+    "appointments": ("appointments.json", "book_date", [
+        ("submit_time", "提交时间"), ("target_mediator", "调解员"), ("name", "姓名"), ("phone", "电话"),
+        ("book_date", "预约日期"), ("book_time", "预约时段"), ("assigned_time", "分配时段"), ("note", "备注"),
+    ]),
+}
+
+
+def check_token(request: Request, token: Optional[str]):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="导出功能未开启（未配置 ADMIN_TOKEN）")
+    given = token or request.headers.get("x-admin-token", "")
+    if not hmac.compare_digest(given.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="口令错误")
+
+
+def parse_date(value: Optional[str], name: str) -> str:
+    if not value:
+        return ""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} 格式应为 YYYY-MM-DD")
+
+
+def filter_records(records, date_field: str, date_from: str, date_to: str, dispute_type: str):
+    """边读边筛，不把整个文件读进内存"""
+    for record in records:
+        # submit_time 形如 "2026-02-18 23:50:38"，只比较日期部分
+        day = str(record.get(date_field, ""))[:10]
+        if date_from and day < date_from:
+            continue
+        if date_to and day > date_to:
+            continue
+        if dispute_type and record.get("dispute_type") != dispute_type:
+            continue
+        yield record
+
+
+# 以这些字符开头的单元格会被 Excel 当成公式执行（例如姓名填 =HYPERLINK(...)）
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def csv_cell(field: str, value) -> str:
+    if value is None:
+        return ""
+    if field == "evidence_files":
+        text = ";".join(value)
+    elif field == "dispute_type":
+        text = DISPUTE_TYPES.get(value, value)
+    elif field in ("book_time", "assigned_time"):
+        text = TIME_SLOTS.get(value, "全天皆可" if value == "any" else value)
+    else:
+        text = str(value)
+    # 前面加一个单引号，Excel 按文本显示
+    if text.startswith(FORMULA_PREFIXES):
+        text = "'" + text
+    return text
+
+
+def iter_csv(records, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # 带 BOM，Excel 打开中文不乱码
+    buffer.write("\ufeff")
+    writer.writerow([title for _, title in columns])
+    for record in records:
+        writer.writerow([csv_cell(field, record.get(field)) for field, _ in columns])
+        # 每行写完就交出去，缓冲区清空复用
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_jsonl(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+# 流式导出调解申请 / 预约记录
+# 例如 /admin/export/submissions?format=csv&date_from=2026-01-01&dispute_type=1
+@api_admin.get("/export/{dataset}")
+def export(
+    request: Request,
+    dataset: str,
+    format: str = Query("csv", pattern="^(csv|jsonl)$"),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    dispute_type: Optional[str] = None,
+    token: Optional[str] = None,
+):
+    check_token(request, token)
+    if dataset not in DATASETS:
+        raise HTTPException(status_code=404, detail="没有这个数据集")
+    filename, date_field, columns = DATASETS[dataset]
+    if dispute_type and "dispute_type" not in dict(columns):
+        raise HTTPException(status_code=400, detail=f"{dataset} 没有纠纷类型，不能按 dispute_type 筛选")
+    date_from = parse_date(date_from, "date_from")
+    date_to = parse_date(date_to, "date_to")
+
+    records = filter_records(iter_json_array("uploads", filename), date_field, date_from, date_to, dispute_type)
+    if format == "csv":
+        body, media_type = iter_csv(records, columns), "text/csv; charset=utf-8"
+    else:
+        body, media_type = iter_jsonl(records), "application/x-ndjson; charset=utf-8"
+
+    out_name = f"{dataset}_{datetime.now().strftime('%Y%m%d%H%M%S')}.{format}"
+    return StreamingResponse(body, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="{out_name}"'
+    })
@@ -1,108 +1,145 @@
-from fastapi import APIRouter, Request, Form
+from fastapi import APIRouter, Request, Form, Query
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, FileResponse
 import os
 import sys
+import logging
+from concurrent.futures.process import BrokenProcessPool
+from typing import List
 sys.path.append("..")
-from utils import load_json, generate_smart_snippet
+from catalog import get_case_catalog, SearchHit
+from citations import get_citation_graph
+from search_index import split_terms, build_snippet, highlight_html, MAX_HIGHLIGHTS
+from pagination import paginate, page_url, DEFAULT_PAGE_SIZE
+from preview import get_preview_cache, PageOutOfRange, preview_format
+from corpus import get_corpus
 
 api_case = APIRouter()
+logger = logging.getLogger(__name__)
 templates = Jinja2Templates(directory="templates")
 
 
 @api_case.get("/", response_class=HTMLResponse)
-async def case_index(request: Request, category: str = "全部"):
-    all_cases = load_json("data", "cases.json")
-    results = []
-
-    for cg, cases in all_cases.items():
-        if category != "全部" and cg != category:
-            continue
-
-        for case in cases:
-            html_path = os.path.join("data", "cases_html", cg, case['filename'] + ".html")
-            with open(html_path, 'r', encoding='utf-8') as f:
-                html_content = f.read()
-            case['category'] = cg
-            case['summary'] = generate_smart_snippet(html_content, '')
-            results.append(case)
+async def case_index(
+    request: Request,
+    category: str = "全部",
+    tags: List[str] = Query(None),  # 多选标签，例如 /case?tags=征收补偿&tags=妇女权益保障
+    mode: str = "and",              # and: 同时满足全部标签；or: 满足任一标签
+    q: str = "",                    # 可选的文本筛选
+    page: int = 1,
+    page_size: int = DEFAULT_PAGE_SIZE
+):
+    catalog = get_case_catalog()
+    tags = tags or []
+    if mode not in ("and", "or"):
+        mode = "and"
+
+    # 先用位图做分类和标签的交/并，再在剩下的结果里做文本匹配
+    bits = catalog.filter_bits(category, tags, mode)
+    bits = catalog.match_bits(bits, q.strip())
+    # 位图已经是显示顺序，只取出本页的案例
+    result_page = catalog.page_for(bits, page, page_size)
 
     return templates.TemplateResponse("case.html", {
         "request": request,
-        "results": results,
+        "results": result_page.items,
+        "page": result_page,
+        "page_url": page_url("/case/", category=category, tags=tags, mode=mode, q=q,
+                             page_size=result_page.page_size),
         "active_tab": "case",
         "current_category": category,
+        "category_counts": catalog.category_counts,
+        "total_count": len(catalog.records),
+        "facet_counts": catalog.facet_counts(bits),
+        "selected_tags": tags,
+        "tag_mode": mode,
+        "filter_query": q,
         "search_query": ""
     })
 
-@api_case.post("/search", response_class=HTMLResponse)
-async def case_search(request: Request, keyword: str = Form(...)):
-    all_cases = load_json("data", "cases.json")
+def render_case_search(request: Request, keyword: str, page: int, page_size: int):
+    catalog = get_case_catalog()
+    terms = split_terms(keyword)
     scored_results = []
     
-    for cg, cases in all_cases.items():
-        for case in cases:
-            score = 0
-            html_path = os.path.join("data", "cases_html", cg, case['filename'] + ".html")
-            with open(html_path, 'r', encoding='utf-8') as f:
-                html_content = f.read()
-            clean_content = generate_smart_snippet(html_content, '', -1)
-            # print(clean_content)
-            title = case['title']
-            keywords = " ".join(case['keywords'])
-
-            # --- 核心：智能加权算法 ---
-            if keyword in title:
-                score += 10       # 标题命中，权重最高
-            if keyword in keywords:
-                score += 5        # 标签/关键词命中，权重次之
-            if keyword in clean_content:
-                score += 1        # 正文命中，权重最低
-            
-            if score > 0:
-                # 动态生成高亮摘要
-                case['summary'] = generate_smart_snippet(html_content, keyword)
-                case['score'] = score
-                case['category'] = cg
-                scored_results.append(case)
-
-    # 按分数从高到低排序 (Lambda表达式)
-    scored_results.sort(key=lambda x: x['score'], reverse=True)
+    for case in catalog.records:
+        score = 0
+        title = case.title.lower()
+        keywords = " ".join(case.keywords).lower()
+        # 正文中各查询词的位置直接从倒排表取
+        positions = case.doc.term_positions(terms)
+
+        # --- 核心：智能加权算法 ---
+        matched_all = True
+        for term in terms:
+            term_score = 0
+            if term in title:
+                term_score += 10  # 标题命中，权重最高
+            if term in keywords:
+                term_score += 5   # 标签/关键词命中，权重次之
+            if positions[term]:
+                term_score += 1   # 正文命中，权重最低
+            if not term_score:
+                matched_all = False
+                break
+            score += term_score
+        
+        if matched_all and score > 0:
+            scored_results.append((score, case, positions))
+
+    # 按分数从高到低排序 (Lambda表达式)，分数相同保持目录顺序
+    scored_results.sort(key=lambda x: x[0], reverse=True)
+
+    # 只给本页的结果生成高亮摘要，用同一份位置信息
+    result_page = paginate(scored_results, page, page_size)
+    results = [SearchHit(case, score, build_snippet(case.doc, positions))
+               for score, case, positions in result_page.items]
 
     return templates.TemplateResponse("case.html", {
         "request": request,
-        "results": scored_results,
+        "results": results,
+        "page": result_page,
+        "page_url": page_url("/case/search", keyword=keyword, page_size=result_page.page_size),
         "active_tab": "case",
         "current_category": "搜索结果",
+        "category_counts": catalog.category_counts,
+        "total_count": len(catalog.records),
         "search_query": keyword
     })
 
+@api_case.post("/search", response_class=HTMLResponse)
+async def case_search(request: Request, keyword: str = Form(...), page: int = Form(1),
+                      page_size: int = Form(DEFAULT_PAGE_SIZE)):
+    return render_case_search(request, keyword, page, page_size)
+
+# 翻页链接走 GET，例如 /case/search?keyword=拆迁&page=2
+@api_case.get("/search", response_class=HTMLResponse)
+async def case_search_page(request: Request, keyword: str = "", page: int = 1,
+                           page_size: int = DEFAULT_PAGE_SIZE):
+    return render_case_search(request, keyword, page, page_size)
+
 @api_case.get("/detail/{case_no}", response_class=HTMLResponse)
-async def case_detail(request: Request, case_no: str):
-    all_cases = load_json("data", "cases.json")
-    case = None
-    category = None
-    for cg, cs in all_cases.items():
-        for c in cs:
-            if c['case_no'] == case_no:
-                case = c
-                category = cg
-                break
-        if case:
-            break
+async def case_detail(request: Request, case_no: str, q: str = ""):
+    # 按案号直接查字典，不再遍历全部分类
+    case = get_case_catalog().get(case_no)
     
     if not case:
         return HTMLResponse("案例不存在", status_code=404)
     
-    html_path = os.path.join("data", "cases_html", category, case['filename'] + ".html")
-    with open(html_path, 'r', encoding='utf-8') as f:
-        case['content'] = f.read()
+    content = get_corpus("cases").read_text(case.html_key)
+    # 根据预先记录的位置插入高亮和锚点
+    content, hits = highlight_html(content, case.doc, case.doc.term_positions(split_terms(q)))
 
     return templates.TemplateResponse("case_detail.html", {
         "request": request,
         "case": case,
+        "content": content,
+        "query": q,
+        "hits": hits,
+        "max_highlights": MAX_HIGHLIGHTS,
+        "citations": get_citation_graph().citations_of(case.case_no),
         "active_tab": "case",
-        "category": category
+        "category": case.category
     })
 
 @api_case.get("/dl/{category}/{filename}")
@@ -114,4 +151,30 @@ async def download_case_pdf(category: str, filename: str):
             filename=filename + ".pdf",
             media_type="application/pdf",
         )
-    return HTMLResponse("文件不存在", status_code=404)
\ No newline at end of file
+    return HTMLResponse("文件不存在", status_code=404)
+
+# 单页预览图，例如 /case/preview/民事/xxx/1，不用下载整个 PDF 就能看一眼
+@api_case.get("/preview/{category}/{filename}/{page}")
+async def preview_case_pdf(category: str, filename: str, page: int):
+    # 路径安全检查，防止路径穿越攻击
+    if ".." in category or ".." in filename or "/" in category or filename.startswith("/"):
+        return HTMLResponse("非法请求", status_code=400)
+
+    file_path = os.path.join("data", "cases_pdf", category, filename + ".pdf")
+    if not os.path.exists(file_path):
+        return HTMLResponse("文件不存在", status_code=404)
+    try:
+        image_path = await get_preview_cache().get(file_path, page)
+    except PageOutOfRange as e:
+        return HTMLResponse(f"页码超出范围（{e}）", status_code=404)
+    except ImportError:
+        return HTMLResponse("服务器未安装 pdfplumber，暂时无法预览", status_code=503)
+    except BrokenProcessPool:
+        return HTMLResponse("预览服务繁忙，请稍后再试", status_code=503)
+    except Exception:
+        # PDF 损坏、格式不支持等，前端会显示"预览加载失败"，下载原文不受影响
+        logger.warning("生成预览失败: %s 第 %d 页", file_path, page, exc_info=True)
+        return HTMLResponse("无法生成该页预览", status_code=404)
+    # 文件名里带着 PDF 的哈希，内容不变就可以让浏览器长期缓存
+    return FileResponse(image_path, media_type=f"image/{preview_format()}",
+                        headers={"Cache-Control": "public, max-age=86400"})
\ No newline at end of file
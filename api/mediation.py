@@ -1,17 +1,22 @@
 from fastapi import Request, UploadFile, APIRouter, Form, File
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, StreamingResponse, FileResponse
+from fastapi.responses import HTMLResponse, StreamingResponse, FileResponse, JSONResponse
 import os
 import shutil
 import uuid
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 import string
 import io
+import json
 import random
 import sys 
 sys.path.append("..")
 from utils import load_json, save_json_append, create_captcha_image, set_captcha, get_captcha, delete_captcha, traverse_captcha
+from booking import get_slot_index, get_mediator_matcher, file_lock, TIME_SLOTS, DISPUTE_TYPES
+from ratelimit import LIMITER
+from api.admin import check_token
+from jobs import enqueue, get_file_meta, THUMBNAIL_DIR
 
 #实例化子路由对象
 api_mediation = APIRouter()
@@ -19,6 +24,13 @@ api_mediation = APIRouter()
 # 设置模板目录
 templates = Jinja2Templates(directory="templates")
 
+
+def js_string(text: str) -> str:
+    """把用户输入转成可以安全放进 <script> 的 JS 字符串字面量（连同引号）"""
+    # json.dumps 负责引号和反斜杠；再转义 < > &，防止输入里的 </script> 提前结束脚本
+    return json.dumps(text, ensure_ascii=False).replace("<", "\\u003c").replace(">", "\\u003e").replace("&", "\\u0026")
+
+
 @api_mediation.get("/", response_class=HTMLResponse)
 async def read_mediation(request: Request):
     mediators = load_json("data", "mediators.json")
@@ -49,8 +61,7 @@ async def book_submit(
     book_time: str = Form(...),
     note: str = Form(None)
 ):
-    # 这里为了简单，我们直接把预约信息当作一种特殊的 submission 保存
-    # 你也可以单独建一个 appointments.json
+    # 预约信息单独存放在 appointments.json
     appointment_data = {
         "submit_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "target_mediator": mediator_name,
@@ -61,15 +72,50 @@ async def book_submit(
         "note": note or "无"
     }
     
-    save_json_append(appointment_data, "uploads", "appointments.json")
+    # 检查时段是否空闲并写入，加锁保证同一时段不会被重复预约
+    slot = get_slot_index().reserve(appointment_data)
+    if slot is None:
+        message = f"抱歉，专家【{mediator_name}】在 {book_date} 的该时段已被预约，请选择其他时间。"
+        return HTMLResponse(f"""
+        <script>
+            alert({js_string(message)});
+            history.back();
+        </script>
+        """)
 
+    message = (f"预约成功！\n专家【{mediator_name}】已收到您的请求（{book_date} {TIME_SLOTS[slot]}），"
+               f"将通过电话 {phone} 与您确认具体时间。")
     return HTMLResponse(f"""
     <script>
-        alert("预约成功！\\n专家【{mediator_name}】已收到您的请求，将通过电话 {phone} 与您确认具体时间。");
+        alert({js_string(message)});
         window.location.href = "/mediation";
     </script>
     """)
 
+# 查询空闲时段，例如 /mediation/availability?date=2026-03-08&mediator=张建国
+# 不传 mediator 时返回全部调解员当天的情况
+@api_mediation.get("/availability")
+async def availability(date: str, mediator: str = None):
+    index = get_slot_index()
+    if mediator:
+        names = [mediator]
+    else:
+        names = [m["name"] for m in get_mediator_matcher().mediators]
+    return JSONResponse({
+        "date": date,
+        "slot_names": TIME_SLOTS,
+        "mediators": {name: index.free_slots(name, date) for name in names}
+    })
+
+# 按纠纷类型推荐调解员，例如 /mediation/match?dispute_type=宅基地 或 dispute_type=2
+@api_mediation.get("/match")
+async def match_mediators(dispute_type: str):
+    return JSONResponse({
+        "dispute_type": DISPUTE_TYPES.get(dispute_type, dispute_type),
+        "mediators": get_mediator_matcher().rank(dispute_type)
+    })
+
+# 画图比较耗 CPU，按 IP 限流并限制并发
 @api_mediation.get("/captcha/{uid}")
 async def get_captcha_img(uid: str, old_uid: str = None):
     # print(f"old_uid: {old_uid}")
@@ -142,6 +188,8 @@ async def mediation_submit(
                 with open(save_path, "wb") as buffer:
                     shutil.copyfileobj(file.file, buffer)
                 saved_file_paths.append(save_path)
+                # 缩略图、哈希等交给后台任务，不在请求里算
+                enqueue(save_path)
 
     submission_data = {
         # "id": uuid.uuid4().hex,
@@ -155,7 +203,9 @@ async def mediation_submit(
         "description": desc,
         "evidence_files": saved_file_paths
     }
-    save_json_append(submission_data, "uploads", "submissions.json")
+    # 原地追加要先读文件末尾再写，多个 worker 同时提交时必须串行，否则会写坏数组
+    with file_lock(os.path.join("uploads", "submissions.json")):
+        save_json_append(submission_data, "uploads", "submissions.json")
 
     return HTMLResponse("""
     <script>
@@ -180,12 +230,16 @@ async def mediation_status_search(request: Request, phone: str = Form(...)):
     # 简单的筛选逻辑：按手机号过滤
     results = [s for s in all_submissions if s.get("phone") == phone or s.get("phone") == "+86" + phone]
     
-    # 纠纷类型映射（因为存的是 1, 2, 3，显示时最好转成中文）
-    type_map = {"1": "合同", "2": "宅基地", "3": "债务", "4": "其他"}
-    
-    # 处理一下数据，方便前端显示
+    # 证据文件的后台处理结果（哈希、缩略图、页数）
+    file_meta = get_file_meta([p for r in results for p in r.get("evidence_files", [])])
+
+    # 处理一下数据，方便前端显示（纠纷类型存的是 1, 2, 3，显示时转成中文）
     for r in results:
-        r['dispute_type_text'] = type_map.get(r.get('dispute_type'), "其他")
+        r['dispute_type_text'] = DISPUTE_TYPES.get(r.get('dispute_type'), "其他")
+        r['evidence'] = [
+            {"name": os.path.basename(p), "meta": file_meta.get(p)}
+            for p in r.get("evidence_files", [])
+        ]
 
     # 按时间倒序排列，最新的在前面
     results.reverse()
@@ -236,6 +290,7 @@ async def upload_submit(
         # 写入文件
         with open(save_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
+        enqueue(save_path)
 
     return HTMLResponse("""
     <script>
@@ -247,28 +302,34 @@ async def upload_submit(
 # 渲染下载列表页面
 @api_mediation.get("/download", response_class=HTMLResponse)
 async def download_page(request: Request):
-    upload_dir = "uploads/media"
+    upload_dir = os.path.join("uploads", "media")
     file_list = []
     
     # 确保文件夹存在
     if os.path.exists(upload_dir):
-        # 遍历文件夹
-        for filename in os.listdir(upload_dir):
-            # 简单的过滤：只显示媒体文件，隐藏 json 和 py 等系统文件
-            if filename.lower().endswith(('.mp4', '.mp3', '.wav', '.mov', '.jpg', '.png', '.doc', '.pdf')):
-                
-                # 获取文件大小 (转为 KB/MB)
-                file_path = os.path.join(upload_dir, filename)
-                size_bytes = os.path.getsize(file_path)
-                if size_bytes < 1024 * 1024:
-                    size_str = f"{size_bytes / 1024:.1f} KB"
-                else:
-                    size_str = f"{size_bytes / (1024 * 1024):.1f} MB"
-
-                file_list.append({
-                    "name": filename,
-                    "size": size_str
-                })
+        # 简单的过滤：只显示媒体文件，隐藏 json 和 py 等系统文件
+        filenames = [
+            f for f in os.listdir(upload_dir)
+            if f.lower().endswith(('.mp4', '.mp3', '.wav', '.mov', '.jpg', '.png', '.doc', '.pdf'))
+        ]
+        # 后台任务已经算好的大小、哈希、缩略图，直接读
+        file_meta = get_file_meta([os.path.join(upload_dir, f) for f in filenames])
+
+        for filename in filenames:
+            file_path = os.path.join(upload_dir, filename)
+            meta = file_meta.get(file_path)
+            # 获取文件大小 (转为 KB/MB)
+            size_bytes = meta["size"] if meta and "size" in meta else os.path.getsize(file_path)
+            if size_bytes < 1024 * 1024:
+                size_str = f"{size_bytes / 1024:.1f} KB"
+            else:
+                size_str = f"{size_bytes / (1024 * 1024):.1f} MB"
+
+            file_list.append({
+                "name": filename,
+                "size": size_str,
+                "meta": meta
+            })
     
     return templates.TemplateResponse("mediation_download.html", {
         "request": request,
@@ -276,6 +337,16 @@ async def download_page(request: Request):
         "files": file_list
     })
 
+# 后台生成的图片缩略图
+@api_mediation.get("/thumbnail/{filename}")
+async def get_thumbnail(filename: str):
+    if ".." in filename or "/" in filename or "\\" in filename:
+        return HTMLResponse("非法的文件名", status_code=400)
+    file_path = os.path.join(THUMBNAIL_DIR, filename)
+    if os.path.exists(file_path):
+        return FileResponse(file_path, media_type="image/jpeg")
+    return HTMLResponse("文件不存在", status_code=404)
+
 # 执行文件下载
 @api_mediation.get("/download/{filename}")
 async def download_file(filename: str):
@@ -291,6 +362,12 @@ async def download_file(filename: str):
     else:
         return HTMLResponse("文件不存在", status_code=404)
     
+# 限流配置和计数，需要管理口令（同导出接口）
+@api_mediation.get("/limits")
+async def rate_limit_stats(request: Request, token: Optional[str] = None):
+    check_token(request, token)
+    return JSONResponse(LIMITER.stats())
+
 @api_mediation.get("/hotline", response_class=HTMLResponse)
 async def hotline_page(request: Request):
     return templates.TemplateResponse("mediation_hotline.html", {
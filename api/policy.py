@@ -1,10 +1,12 @@
 from fastapi import Request, APIRouter
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, FileResponse
-import os
+from fastapi.responses import HTMLResponse, Response
+from urllib.parse import quote
 import sys
 sys.path.append("..")
 from utils import load_json
+from pagination import paginate, page_url, DEFAULT_PAGE_SIZE
+from corpus import get_corpus
 
 #实例化子路由对象
 api_policy = APIRouter()
@@ -12,14 +14,30 @@ api_policy = APIRouter()
 # 设置模板目录
 templates = Jinja2Templates(directory="templates")
 
+# 各地区政策列表（按发布日期倒序），首次调用 get_policies() 时加载
+_POLICIES = None
+
+
+def get_policies():
+    global _POLICIES
+    if _POLICIES is None:
+        _POLICIES = {
+            region: sorted(items, key=lambda p: p.get("date", ""), reverse=True)
+            for region, items in load_json("data", "policies.json").items()
+        }
+    return _POLICIES
+
+
 # 政策列表页
 @api_policy.get("/", response_class=HTMLResponse)
-async def read_policies(request: Request, region: str = "武汉"):
-    policies = load_json("data", "policies.json")
-    current_list = policies.get(region, [])
+async def read_policies(request: Request, region: str = "武汉", page: int = 1,
+                        page_size: int = DEFAULT_PAGE_SIZE):
+    result_page = paginate(get_policies().get(region, []), page, page_size)
     return templates.TemplateResponse("policy.html", {
         "request": request,
-        "results": current_list,
+        "results": result_page.items,
+        "page": result_page,
+        "page_url": page_url("/policy/", region=region, page_size=result_page.page_size),
         "active_tab": "policy",
         "current_region": region
     })
@@ -28,16 +46,16 @@ async def read_policies(request: Request, region: str = "武汉"):
 @api_policy.get("/{region}/{filename}")
 async def download_policy(region: str, filename: str):
     # 路径安全检查，防止路径穿越攻击
-    if ".." in filename or filename.startswith("/"):
+    if ".." in region or ".." in filename or filename.startswith("/"):
         return HTMLResponse("非法请求", status_code=400)
-    
-    file_path = os.path.join("data", "policies_word", region, filename)
-    # print(file_path)
-    if os.path.exists(file_path):
+
+    # 从 policies 语料包里一次读出整个文件（没打包时读 data/policies_word 下的散文件）
+    content = get_corpus("policies").read_bytes(f"{region}/{filename}")
+    if content is not None:
         # 浏览器碰到 .doc/.docx 默认会触发下载
-        return FileResponse(
-            file_path, 
-            filename=filename, 
-            media_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+        return Response(
+            content,
+            media_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+            headers={"Content-Disposition": f"attachment; filename*=utf-8''{quote(filename)}"}
         )
     return HTMLResponse("文件不存在", status_code=404)
@@ -0,0 +1,202 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from utils import load_json, save_json_append
+
+# 文件锁只在类 Unix 系统上可用；Windows 下退化为进程内的线程锁
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+APPOINTMENTS_DIR = "uploads"
+APPOINTMENTS_FILE = "appointments.json"
+# 已占用时段表，多个 worker 共用
+SLOTS_DB_PATH = os.environ.get("SLOTS_DB", os.path.join("uploads", "slots.db"))
+
+# 每天可预约的时段；"any" 表示全天皆可，预约时自动分配第一个空闲时段
+TIME_SLOTS = {"morning": "上午 (09:00 - 12:00)", "afternoon": "下午 (14:00 - 17:00)"}
+ANY_SLOT = "any"
+
+# 纠纷类型（申请表里存的是编号）
+DISPUTE_TYPES = {"1": "合同", "2": "宅基地", "3": "债务", "4": "其他"}
+
+# 全局时段索引 / 调解员匹配器，首次调用 get_xxx() 时加载
+_SLOT_INDEX = None
+_MEDIATOR_MATCHER = None
+
+
+@contextmanager
+def file_lock(path: str):
+    """跨进程互斥：多个 worker 同时改同一个文件时，读和写必须串行"""
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class SlotIndex:
+    """已占用时段表 (调解员, 日期, 时段)，存在各 worker 进程共用的 SQLite 里，三者联合唯一
+
+    预约和查询空闲时段都只查这张表，和历史预约有多少无关；一个 worker 里的预约，
+    其他 worker 下一次查询就能看到。appointments.json 仍然保存完整的预约记录，
+    第一次建表时从它导入已有的预约（之后手工改了 appointments.json，要删掉数据库重新导入）。
+    """
+
+    def __init__(self, db_path: str = SLOTS_DB_PATH, dir: str = APPOINTMENTS_DIR, filename: str = APPOINTMENTS_FILE):
+        self.db_path = db_path
+        self.dir = dir
+        self.filename = filename
+        self.path = os.path.join(dir, filename)
+        self.local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS slots (mediator TEXT, date TEXT, slot TEXT, PRIMARY KEY (mediator, date, slot))"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.import_json()
+
+    def _conn(self) -> sqlite3.Connection:
+        # 连接不能跨线程，也不能跨 fork 使用，按 (进程, 线程) 各开一个
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            self.local.conn, self.local.pid = conn, os.getpid()
+        return conn
+
+    @staticmethod
+    def _taken(conn: sqlite3.Connection, mediator: str, date: str) -> set:
+        rows = conn.execute("SELECT slot FROM slots WHERE mediator = ? AND date = ?", (mediator, date))
+        return {slot for slot, in rows}
+
+    @staticmethod
+    def _first_free(taken: set) -> Optional[str]:
+        for slot in TIME_SLOTS:
+            if slot not in taken:
+                return slot
+        return None
+
+    def import_json(self):
+        """把 appointments.json 里已有的预约导入占用表，只在第一次建表时做一次"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'imported'").fetchone() is None:
+                for appointment in load_json(self.dir, self.filename):
+                    mediator, date = appointment.get("target_mediator"), appointment.get("book_date")
+                    slot = appointment.get("assigned_time") or appointment.get("book_time")
+                    if slot == ANY_SLOT:
+                        # 旧数据里“全天皆可”的预约没有分配时段，按顺序占用第一个空闲时段
+                        slot = self._first_free(self._taken(conn, mediator, date))
+                    if slot:
+                        conn.execute("INSERT OR IGNORE INTO slots VALUES (?, ?, ?)", (mediator, date, slot))
+                conn.execute("INSERT INTO meta VALUES ('imported', ?)", (self.path,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def free_slots(self, mediator: str, date: str) -> Dict[str, bool]:
+        """某调解员某天各时段是否空闲"""
+        taken = self._taken(self._conn(), mediator, date)
+        return {slot: slot not in taken for slot in TIME_SLOTS}
+
+    def reserve(self, appointment: dict) -> Optional[str]:
+        """
+        检查时段并写入预约，整个过程在一个 IMMEDIATE 事务里，多个进程同时预约也是串行的
+        返回: 分配到的时段；时段已被占用时返回 None
+        """
+        mediator = appointment["target_mediator"]
+        date = appointment["book_date"]
+        wanted = appointment["book_time"]
+
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            taken = self._taken(conn, mediator, date)
+            if wanted == ANY_SLOT:
+                slot = self._first_free(taken)
+            elif wanted in TIME_SLOTS and wanted not in taken:
+                slot = wanted
+            else:
+                slot = None
+            if slot is None:
+                conn.execute("ROLLBACK")
+                return None
+
+            conn.execute("INSERT INTO slots VALUES (?, ?, ?)", (mediator, date, slot))
+            appointment["assigned_time"] = slot
+            # 写文件失败时占位跟着回滚
+            save_json_append(appointment, self.dir, self.filename)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return slot
+
+
+def get_slot_index() -> SlotIndex:
+    """获取全局时段索引（首次调用时加载）"""
+    global _SLOT_INDEX
+    if _SLOT_INDEX is None:
+        _SLOT_INDEX = SlotIndex()
+    return _SLOT_INDEX
+
+
+def bigrams(text: str) -> set:
+    return {text[i:i + 2] for i in range(len(text) - 1)} or {text}
+
+
+class MediatorMatcher:
+    """按纠纷类型给调解员打分：纠纷类型与擅长领域（field 按“、”拆开）的二元组重合度"""
+
+    def __init__(self, mediators: List[dict]):
+        self.mediators = mediators
+        # 预先拆好每位调解员的擅长领域
+        self.specialties = [
+            [(s, bigrams(s)) for s in m.get("field", "").split("、") if s]
+            for m in mediators
+        ]
+
+    def rank(self, dispute_type: str) -> List[dict]:
+        text = DISPUTE_TYPES.get(dispute_type, dispute_type).strip()
+        if not text:
+            return []
+        grams = bigrams(text)
+
+        results = []
+        for m, specialties in zip(self.mediators, self.specialties):
+            score = 0.0
+            for name, name_grams in specialties:
+                if text in name or name in text:
+                    s = 1.0
+                else:
+                    # Dice 系数
+                    s = 2 * len(grams & name_grams) / (len(grams) + len(name_grams))
+                score = max(score, s)
+            if score > 0:
+                results.append({
+                    "name": m["name"],
+                    "field": m.get("field", ""),
+                    "rate": m.get("rate", ""),
+                    "score": round(score, 3)
+                })
+        # 分数相同按成功率排，rate 形如 "90%"
+        results.sort(key=lambda r: (r["score"], float(r["rate"].rstrip("%") or 0)), reverse=True)
+        return results
+
+
+def get_mediator_matcher() -> MediatorMatcher:
+    """获取全局调解员匹配器（首次调用时加载 mediators.json）"""
+    global _MEDIATOR_MATCHER
+    if _MEDIATOR_MATCHER is None:
+        _MEDIATOR_MATCHER = MediatorMatcher(load_json("data", "mediators.json"))
+    return _MEDIATOR_MATCHER
@@ -0,0 +1,241 @@
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils import load_json
+from corpus import get_corpus
+from search_index import DocumentText, leading_snippet
+from pagination import Page, clamp
+
+# 案例目录：进程内只加载一次，之后所有请求共用同一份只读数据
+# 格式: CaseCatalog 实例，首次调用 get_case_catalog() 时创建
+_CASE_CATALOG = None
+# 法规目录，同上
+_LAW_CATALOG = None
+
+# 法规正文文件缺失时的默认摘要
+DEFAULT_SUMMARY = "..."
+
+
+class CaseRecord:
+    """单个案例的元数据（只读），用 __slots__ 压缩内存"""
+    __slots__ = ("id", "case_no", "title", "subtitle", "keywords", "filename",
+                 "category", "summary", "doc")
+
+    def __init__(self, raw: dict, category: str, doc: DocumentText):
+        self.id: int = raw["id"]
+        self.case_no: str = raw["case_no"]
+        self.title: str = raw["title"]
+        self.subtitle: str = raw.get("subtitle", "")
+        self.keywords: Tuple[str, ...] = tuple(raw.get("keywords", []))
+        self.filename: str = raw["filename"]
+        self.category: str = category
+        self.doc: DocumentText = doc               # 预处理后的正文，供搜索和摘要使用
+        self.summary: str = leading_snippet(doc)   # 列表页默认摘要（正文开头）
+
+    @property
+    def html_key(self) -> str:
+        """正文在 cases 语料中的文档名"""
+        return f"{self.category}/{self.filename}.html"
+
+    def __repr__(self):
+        return f"CaseRecord({self.case_no!r}, {self.title!r})"
+
+
+class LawRecord:
+    """单部法规的元数据（只读）"""
+    __slots__ = ("id", "title", "date", "tag", "summary", "doc", "has_content")
+
+    def __init__(self, raw: dict, doc: DocumentText, has_content: bool):
+        self.id: int = raw["id"]
+        self.title: str = raw["title"]
+        self.date: str = raw.get("date", "")
+        self.tag: str = raw.get("tag", "")
+        self.doc: DocumentText = doc
+        self.has_content: bool = has_content       # 正文文件是否存在
+        self.summary: str = leading_snippet(doc) if has_content else DEFAULT_SUMMARY
+
+    @property
+    def html_key(self) -> str:
+        """正文在 laws 语料中的文档名"""
+        return f"{self.title}.html"
+
+    def __repr__(self):
+        return f"LawRecord({self.id!r}, {self.title!r})"
+
+
+class SearchHit:
+    """搜索命中结果：引用目录中的记录，附带本次请求的分数和摘要，不修改共享数据"""
+    __slots__ = ("record", "score", "summary")
+
+    def __init__(self, record, score: int, summary: str):
+        self.record = record
+        self.score = score
+        self.summary = summary
+
+    def __getattr__(self, name):
+        # 模板里直接写 item.title / item.case_no，转发给记录本身
+        return getattr(self.record, name)
+
+
+class CaseCatalog:
+    """案例目录：按案号 / (分类, id) / 分类建立字典索引，并预先统计分类和关键词数量
+
+    records 按案号倒序排好（案号以年份开头，即新案例在前），位图的位序就是列表页的显示顺序，
+    分页时不需要再排序。
+    """
+
+    def __init__(self, records: List[CaseRecord]):
+        self.records: Tuple[CaseRecord, ...] = tuple(sorted(records, key=lambda r: r.case_no, reverse=True))
+        self.by_case_no: Dict[str, CaseRecord] = {r.case_no: r for r in self.records}
+        # cases.json 里每个分类的 id 都从 1 开始，只有和分类一起才唯一
+        self.by_id: Dict[Tuple[str, int], CaseRecord] = {(r.category, r.id): r for r in self.records}
+
+        by_category: Dict[str, List[CaseRecord]] = {}
+        for r in self.records:
+            by_category.setdefault(r.category, []).append(r)
+        self.by_category: Dict[str, Tuple[CaseRecord, ...]] = {
+            cg: tuple(rs) for cg, rs in by_category.items()
+        }
+
+        self.category_counts: Dict[str, int] = {cg: len(rs) for cg, rs in self.by_category.items()}
+        self.tag_counts: Dict[str, int] = dict(
+            Counter(tag for r in self.records for tag in r.keywords).most_common()
+        )
+
+        # 位图倒排表：第 i 位为 1 表示 records[i] 属于该分类 / 带有该标签
+        # Python 的 int 是任意长度的，按位与/或就是集合的交/并
+        self.all_bits: int = (1 << len(self.records)) - 1
+        self.category_bits: Dict[str, int] = {}
+        self.tag_bits: Dict[str, int] = {}
+        for i, r in enumerate(self.records):
+            self.category_bits[r.category] = self.category_bits.get(r.category, 0) | (1 << i)
+            for tag in r.keywords:
+                self.tag_bits[tag] = self.tag_bits.get(tag, 0) | (1 << i)
+
+    def get(self, case_no: str) -> Optional[CaseRecord]:
+        return self.by_case_no.get(case_no)
+
+    def get_by_id(self, category: str, case_id: int) -> Optional[CaseRecord]:
+        return self.by_id.get((category, case_id))
+
+    def list(self, category: str = "全部") -> Tuple[CaseRecord, ...]:
+        if category == "全部":
+            return self.records
+        return self.by_category.get(category, ())
+
+    def filter_bits(self, category: str = "全部", tags: Iterable[str] = (), mode: str = "and") -> int:
+        """按分类和标签筛选，返回结果位图。mode 为 and 时要求同时带有全部标签，or 时带有任一标签即可"""
+        bits = self.all_bits if category == "全部" else self.category_bits.get(category, 0)
+        tags = [t for t in tags if t]
+        if not tags:
+            return bits
+
+        if mode == "or":
+            tag_mask = 0
+            for tag in tags:
+                tag_mask |= self.tag_bits.get(tag, 0)
+        else:
+            tag_mask = self.all_bits
+            for tag in tags:
+                tag_mask &= self.tag_bits.get(tag, 0)
+        return bits & tag_mask
+
+    def match_bits(self, bits: int, query: str) -> int:
+        """在已筛选的结果里做文本匹配（标题、关键词、正文），只检查位图中为 1 的案例"""
+        if not query:
+            return bits
+        matched = 0
+        for i, r in self.iter_bits(bits):
+            if query in r.title or any(query in k for k in r.keywords) or r.doc.positions(query.lower()):
+                matched |= 1 << i
+        return matched
+
+    def iter_bits(self, bits: int):
+        """按位图顺序逐个取出 (下标, 案例)"""
+        while bits:
+            low = bits & -bits
+            i = low.bit_length() - 1
+            yield i, self.records[i]
+            bits ^= low
+
+    def records_for(self, bits: int) -> List[CaseRecord]:
+        return [r for _, r in self.iter_bits(bits)]
+
+    def page_for(self, bits: int, page: int = 1, page_size: int = 10) -> Page:
+        """位图结果的某一页：总数用 bit_count 直接得到，只取出本页的案例"""
+        page, page_size = clamp(page, page_size)
+        total = bits.bit_count()
+        page = min(page, max(1, -(-total // page_size)))
+        skip = (page - 1) * page_size
+        items = []
+        for _, r in self.iter_bits(bits):
+            if skip:
+                skip -= 1
+                continue
+            items.append(r)
+            if len(items) == page_size:
+                break
+        return Page(items, page, page_size, total)
+
+    def facet_counts(self, bits: int) -> Dict[str, int]:
+        """当前结果集中每个标签的数量（只返回数量大于 0 的标签，按数量从多到少）"""
+        counts = {}
+        for tag, tag_mask in self.tag_bits.items():
+            n = (tag_mask & bits).bit_count()
+            if n:
+                counts[tag] = n
+        return dict(sorted(counts.items(), key=lambda kv: kv[1], reverse=True))
+
+
+class LawCatalog:
+    """法规目录：按 id 建立字典索引，records 按发布日期倒序排好"""
+
+    def __init__(self, records: List[LawRecord]):
+        self.records: Tuple[LawRecord, ...] = tuple(sorted(records, key=lambda r: r.date, reverse=True))
+        self.by_id: Dict[int, LawRecord] = {r.id: r for r in self.records}
+        self.by_title: Dict[str, LawRecord] = {r.title: r for r in self.records}
+
+    def get(self, law_id: int) -> Optional[LawRecord]:
+        return self.by_id.get(law_id)
+
+
+def read_html(corpus: str, key: str) -> str:
+    """从语料包（或散文件）读取正文，不存在时返回空字符串"""
+    return get_corpus(corpus).read_text(key)
+
+
+def load_case_catalog(dir: str = "data", filename: str = "cases.json") -> CaseCatalog:
+    """读取 cases.json 和对应的 HTML 正文，构建案例目录"""
+    all_cases = load_json(dir, filename)
+    records = []
+    for cg, cases in (all_cases or {}).items():
+        for case in cases:
+            content = read_html("cases", f"{cg}/{case['filename']}.html")
+            records.append(CaseRecord(case, cg, DocumentText.from_html(content)))
+    return CaseCatalog(records)
+
+
+def load_law_catalog(dir: str = "data", filename: str = "laws.json") -> LawCatalog:
+    """读取 laws.json 和对应的 HTML 正文，构建法规目录"""
+    records = []
+    for law in load_json(dir, filename):
+        key = f"{law['title']}.html"
+        has_content = get_corpus("laws").exists(key)
+        records.append(LawRecord(law, DocumentText.from_html(read_html("laws", key)), has_content))
+    return LawCatalog(records)
+
+
+def get_case_catalog() -> CaseCatalog:
+    """获取全局案例目录（首次调用时加载）"""
+    global _CASE_CATALOG
+    if _CASE_CATALOG is None:
+        _CASE_CATALOG = load_case_catalog()
+    return _CASE_CATALOG
+
+
+def get_law_catalog() -> LawCatalog:
+    """获取全局法规目录（首次调用时加载）"""
+    global _LAW_CATALOG
+    if _LAW_CATALOG is None:
+        _LAW_CATALOG = load_law_catalog()
+    return _LAW_CATALOG
@@ -0,0 +1,154 @@
+import os
+import json
+import re
+import html
+from typing import Dict, List
+
+from utils import load_json, cn_to_int
+from corpus import get_corpus
+
+# 输出JSON路径
+OUTPUT_JSON_PATH = 'data/citations.json'
+
+# 全局引用图，首次调用 get_citation_graph() 时加载
+_CITATION_GRAPH = None
+
+# 正则表达式预编译
+# 关联索引板块：从标题一直到下一个标题或正文结束
+INDEX_SECTION_PATTERN = re.compile(r'<h3[^>]*>\s*关联索引\s*</h3>(.*?)(?=<h3|</div>|$)', re.S)
+PARAGRAPH_PATTERN = re.compile(r'<p>(.*?)</p>', re.S)
+# 只去掉真正的标签（标签名以英文字母开头）；书名里的 <中华人民共和国行政诉讼法> 不是标签
+TAG_PATTERN = re.compile(r'</?[a-zA-Z][^>]*>')
+# 书名号里嵌套的书名，统一写成 〈〉，和其他案例的写法一致
+INNER_TITLE_PATTERN = re.compile(r'<([^<>]+)>')
+# 《法律名称》后面跟着一串 第X条、第Y条（条后面可能还有 第N款 / 第N项）
+CITATION_PATTERN = re.compile(
+    r'《([^》]+)》((?:[\s、，,和及]*第[\d零一二三四五六七八九十百千]+条(?:第[\d零一二三四五六七八九十百千]+[款项])*)+)'
+)
+ARTICLE_NO_PATTERN = re.compile(r'第([\d零一二三四五六七八九十百千]+)条')
+
+
+def strip_parentheses(text):
+    """去掉（）里的内容，例如“（本案适用的是……第9条）”是旧法，不算本案引用"""
+    result = []
+    depth = 0
+    for ch in text:
+        if ch in '（(':
+            depth += 1
+        elif ch in '）)':
+            depth = max(0, depth - 1)
+        elif depth == 0:
+            result.append(ch)
+    return "".join(result)
+
+
+def parse_citations(html_content):
+    """
+    解析案例 HTML 的关联索引板块
+    返回: [(法律名称, [条号, ...]), ...]
+    """
+    section = INDEX_SECTION_PATTERN.search(html_content)
+    if not section:
+        return []
+
+    citations = []
+    for p in PARAGRAPH_PATTERN.findall(section.group(1)):
+        text = INNER_TITLE_PATTERN.sub(r'〈\1〉', html.unescape(TAG_PATTERN.sub('', p)))
+        text = strip_parentheses(text)
+        for title, articles_part in CITATION_PATTERN.findall(text):
+            articles = []
+            for no in ARTICLE_NO_PATTERN.findall(articles_part):
+                n = int(no) if no.isdigit() else cn_to_int(no)
+                if n not in articles:
+                    articles.append(n)
+            citations.append((title.strip(), articles))
+    return citations
+
+
+def build_graph(data_dir='data'):
+    """
+    遍历所有案例，生成双向引用图:
+    {
+        "cases": { 案号: [{"law": 法律名称, "law_id": 法规id或null, "articles": [条号]}] },
+        "laws":  { 法规id: { 条号: [案号, ...] } }
+    }
+    """
+    law_ids = {law['title']: law['id'] for law in load_json(data_dir, 'laws.json')}
+    all_cases = load_json(data_dir, 'cases.json')
+
+    graph = {"cases": {}, "laws": {}}
+    for category, cases in all_cases.items():
+        for case in cases:
+            html_content = get_corpus('cases').read_text(f"{category}/{case['filename']}.html")
+            if not html_content:
+                continue
+            citations = parse_citations(html_content)
+
+            entries = {}
+            for title, articles in citations:
+                law_id = law_ids.get(title)
+                # 同一部法律分几段引用时合并成一条
+                entry = entries.setdefault(title, {"law": title, "law_id": law_id, "articles": []})
+                entry["articles"].extend(n for n in articles if n not in entry["articles"])
+                if law_id is None:
+                    continue
+                law_articles = graph["laws"].setdefault(str(law_id), {})
+                for n in articles:
+                    cited_by = law_articles.setdefault(str(n), [])
+                    if case['case_no'] not in cited_by:
+                        cited_by.append(case['case_no'])
+            graph["cases"][case['case_no']] = list(entries.values())
+    return graph
+
+
+class CitationGraph:
+    """案例与法条的双向引用图，查询都是字典查找"""
+
+    def __init__(self, graph: dict):
+        self.case_citations: Dict[str, List[dict]] = graph.get("cases", {})
+        # JSON 的 key 只能是字符串，加载时转回整数
+        self.law_citations: Dict[int, Dict[int, List[str]]] = {
+            int(law_id): dict(sorted((int(n), case_nos) for n, case_nos in articles.items()))
+            for law_id, articles in graph.get("laws", {}).items()
+        }
+
+    def citations_of(self, case_no: str) -> List[dict]:
+        """案例引用了哪些法条"""
+        return self.case_citations.get(case_no, [])
+
+    def cited_articles(self, law_id: int) -> Dict[int, List[str]]:
+        """某部法规中被案例引用的条文: {条号: [案号, ...]}，按条号排序"""
+        return self.law_citations.get(law_id, {})
+
+    def cases_citing(self, law_id: int, article: int) -> List[str]:
+        return self.law_citations.get(law_id, {}).get(article, [])
+
+
+def load_citation_graph(data_dir='data') -> CitationGraph:
+    """优先读取构建好的 citations.json；还没构建过就在启动时现算一份"""
+    graph = load_json(data_dir, os.path.basename(OUTPUT_JSON_PATH))
+    if not graph:
+        graph = build_graph(data_dir)
+    return CitationGraph(graph)
+
+
+def get_citation_graph() -> CitationGraph:
+    """获取全局引用图（首次调用时加载）"""
+    global _CITATION_GRAPH
+    if _CITATION_GRAPH is None:
+        _CITATION_GRAPH = load_citation_graph()
+    return _CITATION_GRAPH
+
+
+def main():
+    graph = build_graph()
+    with open(OUTPUT_JSON_PATH, 'w', encoding='utf-8') as f:
+        json.dump(graph, f, ensure_ascii=False, separators=(',', ':'))
+
+    linked = sum(len(a) for a in graph["laws"].values())
+    print(f"处理完成！共 {len(graph['cases'])} 个案例，{linked} 条被引用的法条")
+    print(f"引用图已保存至: {OUTPUT_JSON_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import os
+import json
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# ================= 配置区域 =================
+# 语料名 -> 原始目录；打包后输出到 data/<语料名>.pack
+CORPORA = {
+    "laws": os.path.join("data", "laws_html"),
+    "cases": os.path.join("data", "cases_html"),
+    "policies": os.path.join("data", "policies_word"),
+}
+PACK_DIR = "data"
+# 解压后文档的缓存上限 (MB)，所有语料共用
+CORPUS_CACHE_MB = float(os.environ.get("CORPUS_CACHE_MB", "64"))
+# ===========================================
+
+# 文件格式: 魔数(4 字节) + 目录长度(4 字节, 小端) + 目录 JSON + 各文档的 zlib 压缩数据
+# 目录: {文档名: [相对数据区的偏移, 压缩后长度, 原始长度]}，文档名是相对原始目录的路径，用 "/" 分隔
+MAGIC = b"CPK1"
+HEADER = struct.Struct("<4sI")
+
+# 全局语料，首次调用 get_corpus() 时打开
+_CORPORA: Dict[str, "Corpus"] = {}
+_CORPORA_LOCK = threading.Lock()
+
+
+def pack_path(name: str) -> str:
+    return os.path.join(PACK_DIR, f"{name}.pack")
+
+
+def build_pack(src_dir: str, out_path: str) -> Tuple[int, int, int]:
+    """把 src_dir 下的所有文件打成一个包，返回 (文件数, 原始大小, 打包后大小)"""
+    index = {}
+    blobs = []
+    offset = raw_total = 0
+    for root, dirs, files in os.walk(src_dir):
+        dirs.sort()
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            key = os.path.relpath(path, src_dir).replace(os.sep, "/")
+            with open(path, "rb") as f:
+                raw = f.read()
+            blob = zlib.compress(raw, 9)
+            index[key] = [offset, len(blob), len(raw)]
+            blobs.append(blob)
+            offset += len(blob)
+            raw_total += len(raw)
+
+    header = json.dumps(index, ensure_ascii=False, separators=(',', ':')).encode("utf-8")
+    # 先写临时文件再改名，正在运行的服务不会读到写了一半的包
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, out_path)
+    return len(index), raw_total, os.path.getsize(out_path)
+
+
+class DocumentCache:
+    """解压后文档的 LRU 缓存，按字节数限制大小"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.items: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key) -> Optional[bytes]:
+        with self.lock:
+            data = self.items.get(key)
+            if data is not None:
+                self.items.move_to_end(key)
+            return data
+
+    def put(self, key, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.items[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self.items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.size = 0
+
+
+DOCUMENT_CACHE = DocumentCache(int(CORPUS_CACHE_MB * 1024 * 1024))
+
+
+class Corpus:
+    """一个语料：优先从打包文件读（一次 seek + read），没有打包或包里没有的文档退回读散文件
+
+    改了 data 下的散文件之后要重新运行 python corpus.py，否则读到的还是包里的旧内容。
+    """
+
+    def __init__(self, name: str, src_dir: str, path: str = None):
+        self.name = name
+        self.src_dir = src_dir
+        self.index: Dict[str, list] = {}
+        self.fd = None
+        self.data_start = 0
+        self.lock = threading.Lock()
+        path = path or pack_path(name)
+        if os.path.exists(path):
+            self._open(path)
+
+    def _open(self, path: str):
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        magic, header_len = HEADER.unpack(os.read(fd, HEADER.size))
+        if magic != MAGIC:
+            os.close(fd)
+            raise ValueError(f"{path} 不是语料包")
+        header = b""
+        while len(header) < header_len:
+            header += os.read(fd, header_len - len(header))
+        self.index = json.loads(header)
+        self.data_start = HEADER.size + header_len
+        self.fd = fd
+
+    @property
+    def packed(self) -> bool:
+        return self.fd is not None
+
+    def _pread(self, offset: int, length: int) -> bytes:
+        if hasattr(os, "pread"):
+            # pread 自带偏移量，多个线程同时读也不用加锁
+            return os.pread(self.fd, length, offset)
+        with self.lock:
+            os.lseek(self.fd, offset, os.SEEK_SET)
+            return os.read(self.fd, length)
+
+    def loose_path(self, key: str) -> str:
+        return os.path.join(self.src_dir, *key.split("/"))
+
+    def exists(self, key: str) -> bool:
+        return key in self.index or os.path.exists(self.loose_path(key))
+
+    def read_bytes(self, key: str) -> Optional[bytes]:
+        """读取文档原始内容，不存在时返回 None"""
+        cache_key = (self.name, key)
+        data = DOCUMENT_CACHE.get(cache_key)
+        if data is not None:
+            return data
+
+        entry = self.index.get(key)
+        if entry is not None:
+            offset, length, _ = entry
+            data = zlib.decompress(self._pread(self.data_start + offset, length))
+        else:
+            path = self.loose_path(key)
+            if not os.path.exists(path):
+                return None
+            with open(path, "rb") as f:
+                data = f.read()
+        DOCUMENT_CACHE.put(cache_key, data)
+        return data
+
+    def read_text(self, key: str, default: str = "") -> str:
+        data = self.read_bytes(key)
+        return data.decode("utf-8") if data is not None else default
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def get_corpus(name: str) -> Corpus:
+    """获取全局语料（首次调用时读取打包文件的目录）"""
+    corpus = _CORPORA.get(name)
+    if corpus is None:
+        with _CORPORA_LOCK:
+            corpus = _CORPORA.get(name)
+            if corpus is None:
+                corpus = _CORPORA[name] = Corpus(name, CORPORA[name])
+    return corpus
+
+
+def reset_corpora(close: bool = True) -> Dict[str, Corpus]:
+    """清空已打开的语料和缓存，下次 get_corpus() 重新打开（重新打包后调用）
+
+    close=False 时旧的语料包不关闭，原样返回，之后可以用 restore_corpora() 放回去
+    """
+    with _CORPORA_LOCK:
+        old = dict(_CORPORA)
+        _CORPORA.clear()
+    if close:
+        for corpus in old.values():
+            corpus.close()
+    DOCUMENT_CACHE.clear()
+    return old
+
+
+def restore_corpora(old: Dict[str, Corpus]):
+    """丢掉当前的语料，换回 reset_corpora(close=False) 返回的旧语料"""
+    reset_corpora()
+    with _CORPORA_LOCK:
+        _CORPORA.update(old)
+
+
+def main():
+    for name, src_dir in CORPORA.items():
+        if not os.path.isdir(src_dir):
+            print(f"跳过 {name}：找不到目录 {src_dir}")
+            continue
+        count, raw_size, packed_size = build_pack(src_dir, pack_path(name))
+        print(f"{name}: {count} 个文件，{raw_size / 1024:.0f} KB -> {packed_size / 1024:.0f} KB，"
+              f"已保存至 {pack_path(name)}")
+
+
+if __name__ == "__main__":
+    main()
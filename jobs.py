@@ -0,0 +1,324 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List
+
+# ================= 配置区域 =================
+JOBS_DB_PATH = os.environ.get("JOBS_DB", os.path.join("uploads", "jobs.db"))
+THUMBNAIL_DIR = os.path.join("uploads", "thumbnails")
+THUMBNAIL_SIZE = (256, 256)
+# 后台进程数
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+# 失败后最多重试几次，每次等待时间翻倍
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 5
+# 没有任务时的轮询间隔（秒）
+POLL_INTERVAL = 1.0
+# 处于 running 状态超过这么久的任务，认为处理它的进程已经退出（秒）
+STALE_AFTER = 600
+# 多久检查一次上面这种任务（秒）；任务进程崩溃重启后，它手上的任务靠这个放回队列
+SWEEP_INTERVAL = 60
+# ===========================================
+
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
+# 需要后台处理的上传目录
+UPLOAD_DIRS = (os.path.join("uploads", "evidence"), os.path.join("uploads", "media"))
+
+# 进程池用 forkserver 启动：任务进程是从带着监听 socket 的主进程 fork 出来的，
+# 直接 fork 的话池里的进程也会拿着这个 socket，任务进程退出后它们还占着端口
+MP_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# 全局任务执行器，应用启动时创建
+RUNNER = None
+# 多进程部署时由单独的任务进程负责，各个 worker 里不再启动
+RUNNER_ENABLED = True
+
+
+def connect(path: str = JOBS_DB_PATH) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+    conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        path TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        next_run REAL NOT NULL,
+        updated REAL NOT NULL
+    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, next_run)")
+    conn.execute("CREATE TABLE IF NOT EXISTS file_meta (path TEXT PRIMARY KEY, meta TEXT NOT NULL)")
+    return conn
+
+
+def enqueue(path: str):
+    """登记一个待处理文件（在请求里调用，只写一行数据库，不做任何计算）"""
+    now = time.time()
+    conn = connect()
+    try:
+        conn.execute(
+            "INSERT INTO jobs (path, status, next_run, updated) VALUES (?, 'pending', ?, ?)",
+            (path, now, now)
+        )
+    finally:
+        conn.close()
+
+
+def backfill(conn: sqlite3.Connection):
+    """启动时补登记：已经在上传目录里、但从没进过队列的旧文件"""
+    known = {row[0] for row in conn.execute("SELECT path FROM jobs UNION SELECT path FROM file_meta")}
+    now = time.time()
+    for upload_dir in UPLOAD_DIRS:
+        if not os.path.exists(upload_dir):
+            continue
+        for filename in os.listdir(upload_dir):
+            path = os.path.join(upload_dir, filename)
+            if path not in known and os.path.isfile(path):
+                conn.execute(
+                    "INSERT INTO jobs (path, status, next_run, updated) VALUES (?, 'pending', ?, ?)",
+                    (path, now, now)
+                )
+
+
+def get_file_meta(paths: List[str]) -> Dict[str, dict]:
+    """批量读取处理结果: {文件路径: meta}；还没处理完的文件不在结果里，
+    重试多次仍然失败的文件返回 {"failed": True, "error": 错误信息}"""
+    if not paths or not os.path.exists(JOBS_DB_PATH):
+        return {}
+    conn = connect()
+    try:
+        placeholders = ",".join("?" * len(paths))
+        rows = conn.execute(f"SELECT path, meta FROM file_meta WHERE path IN ({placeholders})", paths)
+        result = {path: json.loads(meta) for path, meta in rows}
+        rows = conn.execute(
+            f"SELECT path, error FROM jobs WHERE status = 'failed' AND path IN ({placeholders})", paths
+        )
+        for path, error in rows:
+            result.setdefault(path, {"failed": True, "error": error})
+        return result
+    finally:
+        conn.close()
+
+
+# --- 以下函数在子进程中执行 ---
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def pdf_page_count(path: str) -> int:
+    try:
+        import pdfplumber
+    except ImportError:
+        pdfplumber = None
+    if pdfplumber is not None:
+        with pdfplumber.open(path) as pdf:
+            return len(pdf.pages)
+    # 没装 pdfplumber 时粗略数一下页面对象
+    import re
+    with open(path, "rb") as f:
+        return len(re.findall(rb"/Type\s*/Page(?!s)", f.read()))
+
+
+def make_thumbnail(path: str) -> dict:
+    from PIL import Image
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+    thumb_name = os.path.splitext(os.path.basename(path))[0] + ".jpg"
+    with Image.open(path) as img:
+        width, height = img.size
+        img.thumbnail(THUMBNAIL_SIZE)
+        img.convert("RGB").save(os.path.join(THUMBNAIL_DIR, thumb_name), "JPEG", quality=80)
+    return {"width": width, "height": height, "thumbnail": thumb_name}
+
+
+def process_file(path: str) -> dict:
+    """计算文件的大小、哈希，图片生成缩略图，PDF 统计页数
+
+    文件本身读不了才算任务失败；图片、PDF 解析不了（扩展名不对、文件损坏）只记在 meta 里，
+    大小和哈希照样保存，重试也不会有不同的结果
+    """
+    meta = {
+        "size": os.path.getsize(path),
+        "sha256": file_sha256(path),
+        "processed_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    lower = path.lower()
+    try:
+        if lower.endswith(IMAGE_EXTS):
+            meta.update(make_thumbnail(path))
+        elif lower.endswith(".pdf"):
+            meta["pages"] = pdf_page_count(path)
+    except Exception as e:
+        meta["warning"] = "图片无法解析" if lower.endswith(IMAGE_EXTS) else "PDF 无法解析"
+        meta["error"] = repr(e)
+    return meta
+# --- 子进程函数结束 ---
+
+
+class JobRunner:
+    """后台线程从数据库领取任务，交给进程池执行，结果写回 file_meta 表"""
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self.pool = None
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.slots = threading.Semaphore(workers)
+
+    def start(self):
+        conn = connect()
+        try:
+            self.reset_stale(conn)
+            backfill(conn)
+        finally:
+            conn.close()
+        self.pool = self.new_pool()
+        self.thread = threading.Thread(target=self.loop, name="job-runner", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+        if self.pool:
+            # 等池里的进程退出，不然调用方 os._exit() 后它们就成了孤儿进程
+            self.pool.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def reset_stale(conn: sqlite3.Connection):
+        """处理它的进程已经退出（running 太久）的任务，重新放回队列"""
+        conn.execute(
+            "UPDATE jobs SET status = 'pending' WHERE status = 'running' AND updated < ?",
+            (time.time() - STALE_AFTER,)
+        )
+
+    def claim(self, conn: sqlite3.Connection):
+        """原子地领取一个到期的任务，多个进程同时领取也不会重复"""
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, path, attempts FROM jobs WHERE status = 'pending' AND next_run <= ? "
+                "ORDER BY id LIMIT 1", (now,)
+            ).fetchone()
+            if row:
+                conn.execute("UPDATE jobs SET status = 'running', updated = ? WHERE id = ?", (now, row[0]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row
+
+    def loop(self):
+        conn = connect()
+        next_sweep = time.monotonic() + SWEEP_INTERVAL
+        while not self.stop_event.is_set():
+            if time.monotonic() >= next_sweep:
+                next_sweep = time.monotonic() + SWEEP_INTERVAL
+                try:
+                    self.reset_stale(conn)
+                except sqlite3.Error as e:
+                    print(f"重置超时任务出错: {e!r}")
+            # 进程池满了就等
+            if not self.slots.acquire(timeout=POLL_INTERVAL):
+                continue
+            job = None
+            try:
+                job = self.claim(conn)
+                if job is None:
+                    self.slots.release()
+                    self.stop_event.wait(POLL_INTERVAL)
+                    continue
+                job_id, path, attempts = job
+                future = self.pool.submit(process_file, path)
+            except Exception as e:
+                # 出错也不能让线程退出，否则之后的任务再也没人处理
+                print(f"后台任务调度出错: {e!r}")
+                self.slots.release()
+                if job is not None:
+                    self.requeue(job[0])
+                if isinstance(e, BrokenProcessPool):
+                    self.restart_pool()
+                self.stop_event.wait(POLL_INTERVAL)
+                continue
+            future.add_done_callback(lambda f, j=job_id, a=attempts, p=path: self.finish(j, p, a, f))
+        conn.close()
+
+    def requeue(self, job_id: int):
+        """已领取但没能交给进程池的任务，放回队列（不算失败次数）"""
+        try:
+            conn = connect()
+            try:
+                conn.execute("UPDATE jobs SET status = 'pending', updated = ? WHERE id = ?", (time.time(), job_id))
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            # 放不回去也没关系，超过 STALE_AFTER 后下次启动时会被重置
+            print(f"任务 {job_id} 放回队列失败: {e!r}")
+
+    def new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(MP_START_METHOD))
+
+    def restart_pool(self):
+        """进程池里有子进程异常退出后，整个池都不能再用，换一个新的"""
+        old, self.pool = self.pool, self.new_pool()
+        old.shutdown(wait=False, cancel_futures=True)
+
+    def alive(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def finish(self, job_id: int, path: str, attempts: int, future):
+        self.slots.release()
+        now = time.time()
+        conn = connect()
+        try:
+            if future.cancelled():
+                # 进程池关闭时被取消，放回队列等下次启动
+                conn.execute("UPDATE jobs SET status = 'pending', updated = ? WHERE id = ?", (now, job_id))
+                return
+            try:
+                meta = future.result()
+            except Exception as e:
+                attempts += 1
+                if attempts < MAX_ATTEMPTS:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'pending', attempts = ?, error = ?, next_run = ?, updated = ? "
+                        "WHERE id = ?",
+                        (attempts, repr(e), now + RETRY_DELAY * 2 ** (attempts - 1), now, job_id)
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', attempts = ?, error = ?, updated = ? WHERE id = ?",
+                        (attempts, repr(e), now, job_id)
+                    )
+                return
+            conn.execute(
+                "INSERT OR REPLACE INTO file_meta (path, meta) VALUES (?, ?)",
+                (path, json.dumps(meta, ensure_ascii=False))
+            )
+            conn.execute("UPDATE jobs SET status = 'done', error = NULL, updated = ? WHERE id = ?", (now, job_id))
+        finally:
+            conn.close()
+
+
+def start_runner():
+    global RUNNER
+    if RUNNER is None and RUNNER_ENABLED:
+        RUNNER = JobRunner()
+        RUNNER.start()
+    return RUNNER
+
+
+def stop_runner():
+    global RUNNER
+    if RUNNER is not None:
+        RUNNER.stop()
+        RUNNER = None
@@ -1,110 +1,197 @@
+import time
+# 导入开始的时间，用来统计从启动到可以对外服务用了多久
+IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, Form
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse
 import uvicorn
-from utils import load_json
-from api.mediation import api_mediation
-from api.case import api_case
-from api.policy import api_policy
+import argparse
+import prefork
+from api.mediation import api_mediation, templates as mediation_templates
+from api.case import api_case, templates as case_templates
+from api.policy import api_policy, templates as policy_templates
+from api.admin import api_admin
 import os
-from utils import remove_html_tags, generate_smart_snippet
+from catalog import get_law_catalog, get_case_catalog, SearchHit
+from citations import get_citation_graph
+from search_index import split_terms, build_snippet, highlight_html, MAX_HIGHLIGHTS
+from suggest import get_suggest_index
+from jobs import start_runner, stop_runner
+from ratelimit import HeavyEndpointMiddleware
+from preview import close_preview_cache
+from corpus import get_corpus
+from pagination import paginate, page_url, DEFAULT_PAGE_SIZE
+from warmup import warm_up, STATE as WARMUP_STATE
+
+
+def warm_up_app(started: float = IMPORT_STARTED):
+    """预加载目录、索引，并编译所有路由的模板"""
+    return warm_up([templates, case_templates, policy_templates, mediation_templates], started)
+
+
+async def background_warm_up():
+    try:
+        await asyncio.to_thread(warm_up_app)
+    except Exception:
+        pass  # 错误已经记在预热状态里，/readyz 会一直返回 503
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 后台任务：上传文件的缩略图、哈希、页数
+    start_runner()
+    # 预热放到线程里做，服务先起来，/healthz 马上可用，/readyz 等预热完成才返回 200
+    warm_task = asyncio.create_task(background_warm_up())
+    yield
+    warm_task.cancel()
+    stop_runner()
+    close_preview_cache()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
+
+# 验证码和上传接口的限流，在读取请求体之前检查（见 ratelimit.HEAVY_ROUTES）
+app.add_middleware(HeavyEndpointMiddleware)
 
 # 挂载静态文件
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # 设置模板目录
 templates = Jinja2Templates(directory="templates")
-    
+
+# 存活检查：进程能响应就返回 200
+@app.get("/healthz")
+async def healthz():
+    return JSONResponse({"status": "ok"})
+
+# 就绪检查：预热完成前返回 503，负载均衡据此决定是否把流量转过来
+@app.get("/readyz")
+async def readyz():
+    return JSONResponse(WARMUP_STATE, status_code=200 if WARMUP_STATE["ready"] else 503)
+
 app.include_router(api_mediation, prefix='/mediation', tags=['纠纷调解接口'])
 app.include_router(api_case, prefix='/case', tags=['案例检索接口'])
 app.include_router(api_policy, prefix='/policy', tags=['政策公示接口'])
-
-DEFAULT_SUMMARY = "..."
+app.include_router(api_admin, prefix='/admin', tags=['后台管理接口'])
 
 # 首页即法规检索页
 @app.get("/", response_class=HTMLResponse)
-async def read_search(request: Request):
-    current_laws = load_json("data", "laws.json")
-    for item in current_laws:
-        # 尝试读取对应的 HTML 正文文件
-        filename = f"{item['title']}.html"
-        file_path = os.path.join("data", "laws_html", filename)
-        content_html = ''
-        if os.path.exists(file_path):
-            with open(file_path, "r", encoding="utf-8") as f:
-                content_html = f.read()
-            item['summary'] = generate_smart_snippet(content_html, '')
-        else:
-            item['summary'] = DEFAULT_SUMMARY
+async def read_search(request: Request, page: int = 1, page_size: int = DEFAULT_PAGE_SIZE):
+    # 目录已按发布日期排好序，摘要在加载目录时已经生成好，这里只切出本页
+    result_page = paginate(get_law_catalog().records, page, page_size)
 
     return templates.TemplateResponse("search.html", {
         "request": request,
-        "results": current_laws,
+        "results": result_page.items,
+        "page": result_page,
+        "page_url": page_url("/", page_size=result_page.page_size),
         "query": "",
         "active_tab": "law"
     })
 
-# 简单的模糊搜索
-@app.post("/search", response_class=HTMLResponse)
-async def do_search(request: Request, keyword: str = Form(...)):
-    current_laws = load_json("data", "laws.json")
-    results = []
+def render_law_search(request: Request, keyword: str, page: int, page_size: int):
+    terms = split_terms(keyword)
+    matched = []
 
-    for item in current_laws:
-        # 尝试读取对应的 HTML 正文文件
-        filename = f"{item['title']}.html"
-        file_path = os.path.join("data", "laws_html", filename)
+    for law in get_law_catalog().records:
+        title = law.title.lower()
+        positions = law.doc.term_positions(terms)
         
-        content_html = ""
-        full_text_for_search = item['title'] # 默认搜索范围至少包含标题
-
-        if os.path.exists(file_path):
-            with open(file_path, "r", encoding="utf-8") as f:
-                content_html = f.read()
-                # 把正文加到搜索范围里
-                full_text_for_search += remove_html_tags(content_html)
-        
-        # 搜索匹配：检查关键词是否在标题或正文中
-        if keyword.lower() in full_text_for_search.lower():
-            # 动态生成摘要
-            # 如果正文有内容，就从正文截取；否则用默认summary字段
-            if content_html:
-                item['summary'] = generate_smart_snippet(content_html, keyword)
-            else:
-                item['summary'] = DEFAULT_SUMMARY
-            
-            results.append(item)
+        # 搜索匹配：检查每个关键词是否在标题或正文中
+        if all(term in title or positions[term] for term in terms):
+            matched.append((law, positions))
+
+    # 高亮摘要只给本页的结果生成
+    result_page = paginate(matched, page, page_size)
+    results = []
+    for law, positions in result_page.items:
+        # 正文有内容就用命中位置生成高亮摘要；否则用默认摘要
+        summary = build_snippet(law.doc, positions) if law.has_content else law.summary
+        results.append(SearchHit(law, 0, summary))
 
     return templates.TemplateResponse("search.html", {
         "request": request,
         "results": results,
+        "page": result_page,
+        "page_url": page_url("/search", keyword=keyword, page_size=result_page.page_size),
         "query": keyword,
         "active_tab": "law"
     })
 
+# 简单的模糊搜索（多个词用空格分开，要求每个词都在标题或正文中出现）
+@app.post("/search", response_class=HTMLResponse)
+async def do_search(request: Request, keyword: str = Form(...), page: int = Form(1),
+                    page_size: int = Form(DEFAULT_PAGE_SIZE)):
+    return render_law_search(request, keyword, page, page_size)
+
+# 翻页链接走 GET，例如 /search?keyword=征收&page=2
+@app.get("/search", response_class=HTMLResponse)
+async def do_search_page(request: Request, keyword: str = "", page: int = 1,
+                         page_size: int = DEFAULT_PAGE_SIZE):
+    return render_law_search(request, keyword, page, page_size)
+
+# 输入联想：前缀 + 错别字 + 拼音，全部在内存索引里完成
+# 拼音联想（zhaijidi / zjd）需要安装 pypinyin，见 requirements.txt
+@app.get("/suggest")
+async def suggest(q: str = "", limit: int = 8):
+    limit = max(1, min(limit, 20))
+    items = get_suggest_index().suggest(q, limit)
+    return JSONResponse({
+        "query": q,
+        "suggestions": [item.to_dict() for item in items]
+    })
+
 @app.get("/law/{law_id}", response_class=HTMLResponse)
-async def read_law_detail(request: Request, law_id: int):
-    current_laws = load_json("data", "laws.json")
-    law = next((item for item in current_laws if item["id"] == law_id), None)
+async def read_law_detail(request: Request, law_id: int, q: str = ""):
+    # q 是从搜索结果点进来时带上的关键词，用于在正文里高亮并定位
+    law = get_law_catalog().get(law_id)
     if law:
-        content_path = os.path.join("data", "laws_html", f"{law["title"]}.html")
-        if os.path.exists(content_path):
-            with open(content_path, "r", encoding="utf-8") as f:
-                law["content"] = f.read() # 把文件内容读出来，塞给 law 对象
+        hits = []
+        if law.has_content:
+            content = get_corpus("laws").read_text(law.html_key)
+            content, hits = highlight_html(content, law.doc, law.doc.term_positions(split_terms(q)))
         else:
-            law["content"] = "<p>暂无详细内容，或文件丢失。</p>"
+            content = "<p>暂无详细内容，或文件丢失。</p>"
+
+        # 引用了本法条文的案例，直接从引用图里取
+        case_catalog = get_case_catalog()
+        cited_articles = []
+        for article, case_nos in get_citation_graph().cited_articles(law.id).items():
+            cases = [case_catalog.get(no) for no in case_nos if case_catalog.get(no)]
+            if cases:
+                cited_articles.append((article, cases))
 
         return templates.TemplateResponse("detail.html", {
             "request": request,
             "law": law,
+            "content": content,
+            "query": q,
+            "hits": hits,
+            "max_highlights": MAX_HIGHLIGHTS,
+            "cited_articles": cited_articles,
             "active_tab": "law"
         })
     else:
         return HTMLResponse(content="找不到该法规", status_code=404)
  
 if __name__ == "__main__":
-    # 启动命令：python main.py
-    uvicorn.run(app, host="127.0.0.1", port=8080)
\ No newline at end of file
+    # 启动命令：python main.py                          单进程（开发调试）
+    #          python main.py --workers 0 --host 0.0.0.0  多进程，每个 CPU 核一个 worker（仅限 Linux/macOS）
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=1, help="worker 进程数，0 表示按 CPU 核数")
+    parser.add_argument("--max-requests", type=int, default=0, help="每个 worker 处理多少个请求后替换成新的，0 表示不限")
+    args = parser.parse_args()
+
+    workers = args.workers or os.cpu_count() or 1
+    if workers > 1 and prefork.supported():
+        prefork.serve(app, warm_up_app, args.host, args.port, workers, args.max_requests)
+    else:
+        if workers > 1:
+            print("当前系统不支持 fork，以单进程方式启动")
+        uvicorn.run(app, host=args.host, port=args.port)
\ No newline at end of file
@@ -0,0 +1,66 @@
+from math import ceil
+from typing import Sequence
+from urllib.parse import urlencode
+
+# ================= 配置区域 =================
+DEFAULT_PAGE_SIZE = 10
+# 允许的每页条数，其他值一律按默认值处理，避免 page_size=100000 一次渲染全部
+PAGE_SIZES = (10, 20, 50)
+# ===========================================
+
+
+class Page:
+    """一页结果：本页的记录 + 总数，模板里的分页栏只用得到这些"""
+    __slots__ = ("items", "page", "page_size", "total")
+
+    def __init__(self, items: list, page: int, page_size: int, total: int):
+        self.items = items
+        self.page = page
+        self.page_size = page_size
+        self.total = total
+
+    @property
+    def pages(self) -> int:
+        return max(1, ceil(self.total / self.page_size))
+
+    @property
+    def has_prev(self) -> bool:
+        return self.page > 1
+
+    @property
+    def has_next(self) -> bool:
+        return self.page < self.pages
+
+    @property
+    def first_index(self) -> int:
+        """本页第一条是总结果里的第几条（从 1 开始）"""
+        return (self.page - 1) * self.page_size + 1 if self.total else 0
+
+    def window(self, size: int = 7) -> range:
+        """分页栏里显示的页码，以当前页为中心"""
+        start = max(1, min(self.page - size // 2, self.pages - size + 1))
+        return range(start, min(self.pages, start + size - 1) + 1)
+
+
+def clamp(page: int, page_size: int):
+    """把用户传来的页码和每页条数修正到合法范围"""
+    if page_size not in PAGE_SIZES:
+        page_size = DEFAULT_PAGE_SIZE
+    return max(1, page), page_size
+
+
+def paginate(items: Sequence, page: int = 1, page_size: int = DEFAULT_PAGE_SIZE) -> Page:
+    """对已经排好序的序列切片，只取本页"""
+    page, page_size = clamp(page, page_size)
+    total = len(items)
+    # 页码超出范围时停在最后一页
+    page = min(page, max(1, ceil(total / page_size)))
+    start = (page - 1) * page_size
+    return Page(list(items[start:start + page_size]), page, page_size, total)
+
+
+def page_url(path: str, **params) -> str:
+    """生成分页链接的前缀，模板里在后面拼上页码，例如 /case?category=民事&page="""
+    query = urlencode([(k, v) for k, vs in params.items()
+                       for v in (vs if isinstance(vs, (list, tuple)) else [vs]) if v not in (None, "")])
+    return f"{path}?{query + '&' if query else ''}page="
@@ -0,0 +1,293 @@
+import gc
+import os
+import random
+import signal
+import socket
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import uvicorn
+
+import jobs
+import ratelimit
+import utils
+import warmup
+
+# ================= 配置区域 =================
+# 关闭 / 轮换 worker 时，等它处理完手上请求的最长时间（秒），超时强制结束
+GRACEFUL_TIMEOUT = 30
+# 滚动重启时，新 worker 起来后等多久再关旧的（秒）；两者共用一个监听 socket，这段时间内不会丢连接
+ROLL_DELAY = 1.0
+# 回收阈值在 max_requests 上下随机浮动的比例，避免所有 worker 同时重启
+MAX_REQUESTS_JITTER = 0.1
+# 多个 worker 共用的验证码库
+CAPTCHA_DB_PATH = os.environ.get("CAPTCHA_DB", os.path.join("uploads", "captcha.db"))
+# ===========================================
+
+
+def supported() -> bool:
+    """只有类 Unix 系统有 fork；Windows 下退回单进程"""
+    return hasattr(os, "fork")
+
+
+class Master:
+    """预先 fork 的多进程服务
+
+    主进程负责预热（加载目录、索引、模板），然后 gc.freeze() 并 fork 出 N 个 worker。
+    worker 之间以写时复制的方式共享这些只读数据，各自在同一个监听 socket 上跑 uvicorn。
+    另外 fork 一个任务进程跑上传文件的后台任务，worker 里不再各开一份。
+
+    信号:
+        SIGHUP          重新加载数据，然后逐个替换 worker（滚动重启）
+        SIGTERM/SIGINT  等所有 worker 处理完手上的请求后退出
+    worker 处理满 max_requests 个请求后通知主进程，主进程像滚动重启一样先补上新的再让它退出；
+    意外退出的 worker 会被立即补上。
+    """
+
+    def __init__(self, app, warm_up: Callable[..., dict], host: str, port: int, workers: int,
+                 max_requests: int = 0):
+        self.app = app
+        self.warm_up = warm_up
+        self.host = host
+        self.port = port
+        self.worker_count = workers
+        self.max_requests = max_requests
+        self.sock: Optional[socket.socket] = None
+        self.workers: Dict[int, float] = {}      # pid -> 启动时间
+        self.retiring: Dict[int, float] = {}     # 已通知退出、还没退出的 pid -> 通知时间
+        self.job_pid: Optional[int] = None
+        self.stopping = False
+        self.reload_requested = False
+        # worker 处理满 max_requests 后往这个管道写自己的 pid
+        self.recycle_r: Optional[int] = None
+        self.recycle_w: Optional[int] = None
+
+    # ---------- 主进程 ----------
+    def bind(self) -> socket.socket:
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def freeze(self):
+        # 预热产生的对象移到永久代，之后 worker 里的垃圾回收不会去碰它们，
+        # 引用计数之外的写入少了，共享的内存页就不会被一页页复制
+        gc.collect()
+        gc.freeze()
+
+    def fork(self, target: Callable[[], None]) -> int:
+        pid = os.fork()
+        if pid == 0:
+            # 子进程：恢复默认信号处理，随机数重新播种（否则各 worker 出的验证码一模一样）
+            for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+                signal.signal(sig, signal.SIG_DFL)
+            random.seed()
+            code = 0
+            try:
+                target()
+            except BaseException as e:
+                print(f"[{os.getpid()}] 子进程异常退出: {e!r}")
+                code = 1
+            finally:
+                os._exit(code)
+        return pid
+
+    def spawn_worker(self):
+        pid = self.fork(self.run_worker)
+        self.workers[pid] = time.monotonic()
+        print(f"[master] 启动 worker {pid}")
+
+    def spawn_job_process(self):
+        self.job_pid = self.fork(self.run_jobs)
+        print(f"[master] 启动任务进程 {self.job_pid}")
+
+    def retire(self, pid: int):
+        """通知 worker 处理完手上的请求后退出"""
+        self.workers.pop(pid, None)
+        self.retiring[pid] = time.monotonic()
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            self.retiring.pop(pid, None)
+
+    def reap(self):
+        """回收已退出的子进程，必要时补上新的"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid in self.retiring:
+                self.retiring.pop(pid)
+            elif pid in self.workers:
+                self.workers.pop(pid)
+                if not self.stopping:
+                    # 崩溃或被杀掉了，补一个
+                    print(f"[master] worker {pid} 已退出 (status={status})，补充新 worker")
+                    self.spawn_worker()
+            elif pid == self.job_pid:
+                self.job_pid = None
+                if not self.stopping:
+                    self.spawn_job_process()
+
+    def kill_stuck(self):
+        """通知退出后超时还没退出的，强制结束"""
+        now = time.monotonic()
+        for pid, since in list(self.retiring.items()):
+            if now - since > GRACEFUL_TIMEOUT:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def recycle(self):
+        """处理满 max_requests 的 worker：先起新的，等一会儿再让旧的退出，不丢连接"""
+        try:
+            data = os.read(self.recycle_r, 4096)
+        except BlockingIOError:
+            return
+        for pid in {int(p) for p in data.split()}:
+            # 期间被滚动重启换掉的就不用管了
+            if pid in self.workers and not self.stopping:
+                print(f"[master] worker {pid} 已处理满 {self.max_requests} 个请求，替换")
+                self.spawn_worker()
+                time.sleep(ROLL_DELAY)
+                self.retire(pid)
+
+    def rolling_restart(self):
+        """重新加载数据，再逐个替换 worker：先起新的，等一会儿再关旧的"""
+        print("[master] 收到 SIGHUP，重新加载数据")
+        old = warmup.reset()
+        try:
+            self.warm_up(time.perf_counter())
+        except Exception:
+            # 新数据有问题就换回旧数据、不换 worker；之后补上的 worker 也继续用旧数据
+            warmup.restore(old)
+            return
+        warmup.release(old)
+        self.freeze()
+        for pid in list(self.workers):
+            if self.stopping:
+                return
+            self.spawn_worker()
+            time.sleep(ROLL_DELAY)
+            self.retire(pid)
+            self.reap()
+        print("[master] 滚动重启完成")
+
+    def handle_signal(self, signum, frame):
+        if signum == signal.SIGHUP:
+            self.reload_requested = True
+        elif signum in (signal.SIGTERM, signal.SIGINT):
+            self.stopping = True
+
+    def serve(self):
+        if ratelimit.BACKEND == "memory":
+            print("[master] 提示: 多进程模式下建议设置 RATE_LIMIT_BACKEND=sqlite，否则每个 worker 各自限流")
+
+        self.warm_up()
+        # 验证码改存到各进程共用的 SQLite 里
+        utils.CAPTCHA_STORE = utils.SqliteCaptchaStore(CAPTCHA_DB_PATH)
+        self.sock = self.bind()
+        self.recycle_r, self.recycle_w = os.pipe()
+        os.set_blocking(self.recycle_r, False)
+        self.freeze()
+        print(f"[master] {os.getpid()} 监听 http://{self.host}:{self.port}，启动 {self.worker_count} 个 worker")
+
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self.handle_signal)
+        # SIGCHLD 只用来打断 sleep，回收在主循环里做
+        signal.signal(signal.SIGCHLD, lambda *_: None)
+
+        self.spawn_job_process()
+        for _ in range(self.worker_count):
+            self.spawn_worker()
+
+        while not self.stopping:
+            if self.reload_requested:
+                self.reload_requested = False
+                self.rolling_restart()
+            self.recycle()
+            self.reap()
+            self.kill_stuck()
+            time.sleep(0.5)
+
+        self.shutdown()
+
+    def shutdown(self):
+        print("[master] 正在关闭，等待 worker 处理完当前请求")
+        for pid in list(self.workers):
+            self.retire(pid)
+        if self.job_pid:
+            self.retiring[self.job_pid] = time.monotonic()
+            os.kill(self.job_pid, signal.SIGTERM)
+            self.job_pid = None
+        while self.retiring:
+            self.reap()
+            self.kill_stuck()
+            time.sleep(0.1)
+        self.sock.close()
+        os.close(self.recycle_r)
+        os.close(self.recycle_w)
+        print("[master] 已退出")
+
+    # ---------- 子进程 ----------
+    def run_worker(self):
+        # 后台任务由任务进程统一处理
+        jobs.RUNNER_ENABLED = False
+        os.close(self.recycle_r)
+        app = self.app
+        if self.max_requests > 0:
+            # 不用 uvicorn 的 limit_max_requests：它到数就直接关掉监听，排队中的连接会被重置
+            jitter = int(self.max_requests * MAX_REQUESTS_JITTER)
+            limit = self.max_requests + random.randint(-jitter, jitter)
+            app = RequestCounter(app, limit, self.notify_recycle)
+        config = uvicorn.Config(app, timeout_graceful_shutdown=GRACEFUL_TIMEOUT)
+        # 数据和模板已经在主进程预热好，lifespan 里的预热会直接返回
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def notify_recycle(self):
+        # 不超过 PIPE_BUF 的写入是原子的，多个 worker 同时写也不会交错
+        os.write(self.recycle_w, f"{os.getpid()}\n".encode())
+
+    def run_jobs(self):
+        self.sock.close()
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        signal.signal(signal.SIGINT, lambda *_: stop.set())
+        runner = jobs.JobRunner()
+        runner.start()
+        try:
+            while not stop.wait(1):
+                if not runner.alive():
+                    # 调度线程意外退出：任务进程跟着退出，由主进程重新拉起
+                    raise RuntimeError("后台任务线程已退出")
+        finally:
+            runner.stop()
+
+
+class RequestCounter:
+    """ASGI 包装：数 worker 处理过的请求，到 limit 个时调用一次 notify"""
+
+    def __init__(self, app, limit: int, notify: Callable[[], None]):
+        self.app = app
+        self.limit = limit
+        self.notify = notify
+        self.count = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            self.count += 1
+            if self.count == self.limit:
+                self.notify()
+        await self.app(scope, receive, send)
+
+
+def serve(app, warm_up: Callable[..., dict], host: str, port: int, workers: int, max_requests: int = 0):
+    Master(app, warm_up, host, port, workers, max_requests).serve()
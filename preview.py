@@ -0,0 +1,214 @@
+import os
+import asyncio
+import hashlib
+import threading
+import multiprocessing
+from collections import OrderedDict
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+
+# ================= 配置区域 =================
+PREVIEW_CACHE_DIR = os.environ.get("PREVIEW_CACHE_DIR", os.path.join("cache", "previews"))
+# 缓存目录大小上限 (MB)，超过后删掉最久没被访问的图片
+PREVIEW_CACHE_MB = float(os.environ.get("PREVIEW_CACHE_MB", "200"))
+# 预览图宽度（像素）
+PREVIEW_WIDTH = int(os.environ.get("PREVIEW_WIDTH", "600"))
+# 渲染进程数
+PREVIEW_WORKERS = int(os.environ.get("PREVIEW_WORKERS", "2"))
+# ===========================================
+
+# 渲染进程的启动方式。进程池是在已经跑起来的 worker 里按需创建的，直接 fork 会把
+# uvicorn 的线程和监听 socket 一起带进子进程；forkserver 从一个干净的服务进程 fork，不继承这些
+MP_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# 全局预览缓存，首次调用 get_preview_cache() 时创建
+_PREVIEW_CACHE = None
+
+
+class PageOutOfRange(Exception):
+    pass
+
+
+@lru_cache(maxsize=None)
+def preview_format() -> str:
+    """Pillow 编译时带了 WebP 就用 WebP（体积约为 PNG 的三分之一），否则用 PNG
+    第一次生成预览时才检查，避免每个进程启动都导入 Pillow"""
+    try:
+        from PIL import features
+        return "webp" if features.check("webp") else "png"
+    except ImportError:
+        return "png"
+
+
+# --- 以下函数在子进程中执行 ---
+def render_page(pdf_path: str, page_no: int, out_path: str, width: int, fmt: str):
+    """用 pdfplumber 把第 page_no 页（从 1 开始）渲染成图片，先写临时文件再改名，避免读到半张图"""
+    import pdfplumber
+    with pdfplumber.open(pdf_path) as pdf:
+        if not 1 <= page_no <= len(pdf.pages):
+            raise PageOutOfRange(f"共 {len(pdf.pages)} 页")
+        image = pdf.pages[page_no - 1].to_image(width=width).original
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    if fmt == "webp":
+        image.save(tmp_path, "WEBP", quality=80, method=4)
+    else:
+        image.save(tmp_path, "PNG", optimize=True)
+    os.replace(tmp_path, out_path)
+    return os.path.getsize(out_path)
+# --- 子进程函数结束 ---
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class PreviewCache:
+    """PDF 单页预览图的磁盘 LRU 缓存
+
+    文件名是 "PDF 哈希_页码.扩展名"，PDF 内容变了哈希就变，旧图自然不会再被命中，
+    之后按 LRU 被清理掉。文件的修改时间当作最近访问时间，命中时刷新，
+    多个 worker 进程共用同一个缓存目录。
+    """
+
+    def __init__(self, cache_dir: str = PREVIEW_CACHE_DIR, max_bytes: int = int(PREVIEW_CACHE_MB * 1024 * 1024)):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # 文件名 -> 大小，按访问先后排列（最近访问的在最后）
+        self.entries: "OrderedDict[str, int]" = OrderedDict()
+        self.total = 0
+        # PDF 路径 -> (修改时间, 大小, 哈希)，PDF 没变就不重新计算哈希
+        self.hashes: Dict[str, Tuple[int, int, str]] = {}
+        # 正在渲染的页面，同一页同时被请求多次只渲染一次
+        self.pending: Dict[str, asyncio.Future] = {}
+        self.pool: Optional[ProcessPoolExecutor] = None
+        os.makedirs(cache_dir, exist_ok=True)
+        self.scan()
+
+    def scan(self):
+        """从磁盘重建索引（别的进程也可能写入或删除了文件）"""
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".tmp"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime_ns, name, st.st_size))
+        files.sort()
+        self.entries = OrderedDict((name, size) for _, name, size in files)
+        self.total = sum(self.entries.values())
+
+    def pdf_hash(self, pdf_path: str) -> str:
+        st = os.stat(pdf_path)
+        cached = self.hashes.get(pdf_path)
+        if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return cached[2]
+        digest = file_sha256(pdf_path)
+        self.hashes[pdf_path] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    def touch(self, name: str) -> bool:
+        """命中时刷新访问时间；文件已被别的进程清理掉则返回 False"""
+        path = os.path.join(self.cache_dir, name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self.lock:
+                self.total -= self.entries.pop(name, 0)
+            return False
+        with self.lock:
+            if name in self.entries:
+                self.entries.move_to_end(name)
+            else:
+                size = os.path.getsize(path)
+                self.entries[name] = size
+                self.total += size
+        return True
+
+    def add(self, name: str, size: int):
+        with self.lock:
+            self.total += size - self.entries.pop(name, 0)
+            self.entries[name] = size
+            if self.total > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        """删除最久没被访问的图片，直到总大小回到上限的九成以下"""
+        self.scan()
+        target = self.max_bytes * 0.9
+        while self.entries and self.total > target:
+            name, size = self.entries.popitem(last=False)
+            self.total -= size
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+
+    def get_pool(self) -> ProcessPoolExecutor:
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(
+                max_workers=PREVIEW_WORKERS, mp_context=multiprocessing.get_context(MP_START_METHOD)
+            )
+        return self.pool
+
+    async def get(self, pdf_path: str, page_no: int) -> str:
+        """返回预览图路径：缓存里有就直接用，没有就交给进程池渲染"""
+        loop = asyncio.get_running_loop()
+        # 第一次见到的 PDF 要算哈希，放到线程里做，不卡住事件循环
+        digest = await loop.run_in_executor(None, self.pdf_hash, pdf_path)
+        fmt = preview_format()
+        name = f"{digest[:32]}_{page_no}.{fmt}"
+        path = os.path.join(self.cache_dir, name)
+        if self.touch(name):
+            return path
+
+        future = self.pending.get(name)
+        if future is None:
+            future = asyncio.wrap_future(self.get_pool().submit(
+                render_page, pdf_path, page_no, path, PREVIEW_WIDTH, fmt
+            ))
+            self.pending[name] = future
+            future.add_done_callback(lambda f: self.rendered(name, f))
+        # 客户端断开只取消自己这次等待，渲染继续，等同一页的其他请求不受影响
+        await asyncio.shield(future)
+        return path
+
+    def rendered(self, name: str, future: asyncio.Future):
+        """渲染结束（不管有没有请求还在等）：登记到缓存索引"""
+        del self.pending[name]
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            self.add(name, future.result())
+        elif isinstance(error, BrokenProcessPool):
+            # 渲染进程崩溃后整个池都不能再用，下次请求时重新创建；
+            # 池里剩下的进程已经被结束了，不用在事件循环里等
+            self.close(wait=False)
+
+    def close(self, wait: bool = True):
+        """关闭渲染进程池。进程退出前要等池里的进程都结束，否则它们会变成孤儿进程"""
+        if self.pool:
+            self.pool.shutdown(wait=wait, cancel_futures=True)
+            self.pool = None
+
+
+def get_preview_cache() -> PreviewCache:
+    """获取全局预览缓存（首次调用时扫描缓存目录）"""
+    global _PREVIEW_CACHE
+    if _PREVIEW_CACHE is None:
+        _PREVIEW_CACHE = PreviewCache()
+    return _PREVIEW_CACHE
+
+
+def close_preview_cache():
+    if _PREVIEW_CACHE is not None:
+        _PREVIEW_CACHE.close()
@@ -0,0 +1,272 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+# ================= 配置区域 =================
+# 所有配置都可以用环境变量覆盖，格式 "次数/秒数"，例如 RATE_LIMIT_CAPTCHA=20/60 表示每分钟 20 次
+DEFAULT_BUDGETS = {
+    "captcha": "20/60",   # 验证码图片（PIL 画图，最耗 CPU）
+    "submit": "5/60",     # 调解申请提交（可带多个证据文件）
+    "upload": "5/60",     # 音视频上传
+}
+# 同时在处理的重请求上限，超过直接 503
+MAX_CONCURRENT = int(os.environ.get("RATE_LIMIT_MAX_CONCURRENT", "8"))
+# 上传大小上限 (MB)
+MAX_UPLOAD_MB = float(os.environ.get("RATE_LIMIT_MAX_UPLOAD_MB", "50"))
+# memory: 每个进程各算各的；sqlite: 多个 worker 共用一个本地数据库文件
+BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")
+SQLITE_PATH = os.environ.get("RATE_LIMIT_DB", os.path.join("uploads", "ratelimit.db"))
+# 部署在反向代理后面时，前面有几层可信的代理（每层都往 X-Forwarded-For 末尾追加一个地址）；
+# 0 表示不信任 X-Forwarded-For。旧配置 RATE_LIMIT_TRUST_PROXY=1 等于 1 层
+PROXY_HOPS = int(os.environ.get("RATE_LIMIT_PROXY_HOPS", os.environ.get("RATE_LIMIT_TRUST_PROXY", "0")))
+# 需要限流的接口: (请求方法, 路径) -> (预算名, 是否带上传)；路径以 "/" 结尾表示前缀匹配
+HEAVY_ROUTES = {
+    ("GET", "/mediation/captcha/"): ("captcha", False),
+    ("POST", "/mediation/submit"): ("submit", True),
+    ("POST", "/mediation/upload/submit"): ("upload", True),
+}
+# ===========================================
+
+# 内存后端最多保留的桶数量，超过后清理已经回满的桶
+MAX_MEMORY_BUCKETS = 10000
+
+
+def parse_budget(text: str) -> Tuple[float, float]:
+    """ "20/60" -> (每秒补充的令牌数, 桶容量) """
+    count, seconds = text.split("/")
+    return float(count) / float(seconds), float(count)
+
+
+def get_budget(name: str) -> Tuple[float, float]:
+    return parse_budget(os.environ.get(f"RATE_LIMIT_{name.upper()}", DEFAULT_BUDGETS[name]))
+
+
+class MemoryBackend:
+    """进程内令牌桶: {key: (剩余令牌, 上次更新时间)}"""
+
+    blocking = False
+
+    def __init__(self):
+        self.buckets: Dict[str, Tuple[float, float]] = {}
+        self.lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        """取一个令牌。成功返回 0，失败返回需要等待的秒数"""
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated = self.buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self.buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self.buckets[key] = (tokens, now)
+                wait = (1 - tokens) / rate
+            if len(self.buckets) > MAX_MEMORY_BUCKETS:
+                self._prune(now)
+        return wait
+
+    def _prune(self, now: float):
+        # 一小时没动过的桶肯定已经回满，删掉不影响结果
+        for key, (_, updated) in list(self.buckets.items()):
+            if now - updated > 3600:
+                del self.buckets[key]
+
+
+class SqliteBackend:
+    """共享令牌桶：多个 worker 进程读写同一个 SQLite 文件，用 IMMEDIATE 事务保证原子性"""
+
+    # 别的进程持有写锁时 BEGIN IMMEDIATE 最多等 5 秒，不能在事件循环里直接调用
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self.local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite 连接不能跨线程、也不能跨 fork 使用：每个线程一个，fork 出来的子进程重新打开
+        # （LIMITER 在导入时创建，主进程里打开的连接会被 worker 继承下来）
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self.local.conn, self.local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        # 跨进程要用墙上时间，monotonic 在不同进程之间不可比
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, tokens, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+class Limiter:
+    """按 (客户端 IP, 接口) 限流，并限制重请求的并发数"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.active = 0
+        self.lock = threading.Lock()
+        # 计数器: {接口: {"allowed": n, "limited": n, "shed": n, "too_large": n}}
+        self.counters: Dict[str, Dict[str, int]] = {}
+
+    def count(self, name: str, field: str):
+        with self.lock:
+            c = self.counters.setdefault(name, {"allowed": 0, "limited": 0, "shed": 0, "too_large": 0})
+            c[field] += 1
+
+    def try_enter(self) -> bool:
+        with self.lock:
+            if self.active >= MAX_CONCURRENT:
+                return False
+            self.active += 1
+            return True
+
+    def leave(self):
+        with self.lock:
+            self.active -= 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "backend": BACKEND,
+                "active": self.active,
+                "max_concurrent": MAX_CONCURRENT,
+                "max_upload_mb": MAX_UPLOAD_MB,
+                "budgets": {name: os.environ.get(f"RATE_LIMIT_{name.upper()}", b)
+                            for name, b in DEFAULT_BUDGETS.items()},
+                "counters": {k: dict(v) for k, v in self.counters.items()},
+            }
+
+
+def create_limiter() -> Limiter:
+    if BACKEND == "sqlite":
+        return Limiter(SqliteBackend(SQLITE_PATH))
+    return Limiter(MemoryBackend())
+
+
+# 全局限流器
+LIMITER = create_limiter()
+
+
+def client_ip(request: Request) -> str:
+    """客户端 IP。X-Forwarded-For 左边的部分是客户端自己填的，随便改，
+    只有最右边 PROXY_HOPS 个是可信代理追加的，取其中最左边的一个"""
+    if PROXY_HOPS > 0:
+        forwarded = [p.strip() for p in request.headers.get("x-forwarded-for", "").split(",") if p.strip()]
+        if forwarded:
+            return forwarded[-min(PROXY_HOPS, len(forwarded))]
+    return request.client.host if request.client else "unknown"
+
+
+class HeavyEndpointMiddleware:
+    """
+    ASGI 中间件，挂在 app 上，对 HEAVY_ROUTES 里的耗 CPU / 带上传的接口做检查:
+    app.add_middleware(HeavyEndpointMiddleware)
+    超过频率返回 429，并发已满返回 503，上传过大返回 413 —— 都在读取请求体之前完成。
+    (FastAPI 的依赖项要等表单整个解析完才执行，所以不能用 Depends 来做)
+    """
+
+    def __init__(self, app, routes: Dict[Tuple[str, str], Tuple[str, bool]] = None):
+        self.app = app
+        self.routes = routes if routes is not None else HEAVY_ROUTES
+        self.budgets = {name: get_budget(name) for name, _ in self.routes.values()}
+        self.max_bytes = int(MAX_UPLOAD_MB * 1024 * 1024)
+
+    def match(self, scope) -> Optional[Tuple[str, bool]]:
+        method, path = scope["method"], scope["path"]
+        for (route_method, prefix), route in self.routes.items():
+            # 以 "/" 结尾的是前缀（例如 /mediation/captcha/{uid}），否则要求完全相同
+            if method == route_method and (path == prefix or (prefix.endswith("/") and path.startswith(prefix))):
+                return route
+        return None
+
+    async def __call__(self, scope, receive, send):
+        route = self.match(scope) if scope["type"] == "http" else None
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+        name, upload = route
+        request = Request(scope)
+
+        if upload:
+            length = request.headers.get("content-length")
+            if length is None:
+                return await self.reject(scope, receive, send, 411, "上传请求需要 Content-Length")
+            if not length.isdigit():
+                return await self.reject(scope, receive, send, 400, "Content-Length 不合法")
+            if int(length) > self.max_bytes:
+                LIMITER.count(name, "too_large")
+                return await self.reject(scope, receive, send, 413, f"上传文件不能超过 {MAX_UPLOAD_MB:g} MB")
+            receive = self.limit_body(receive, name, int(length))
+
+        rate, burst = self.budgets[name]
+        key = f"{name}:{client_ip(request)}"
+        backend = LIMITER.backend
+        if backend.blocking:
+            wait = await run_in_threadpool(backend.take, key, rate, burst)
+        else:
+            wait = backend.take(key, rate, burst)
+        if wait > 0:
+            LIMITER.count(name, "limited")
+            return await self.reject(scope, receive, send, 429, "请求过于频繁，请稍后再试",
+                                     {"Retry-After": str(int(wait) + 1)})
+
+        if not LIMITER.try_enter():
+            LIMITER.count(name, "shed")
+            return await self.reject(scope, receive, send, 503, "服务器繁忙，请稍后再试", {"Retry-After": "1"})
+        LIMITER.count(name, "allowed")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            LIMITER.leave()
+
+    def limit_body(self, receive, name: str, declared: int):
+        """边读边数字节数：实际发来的比 Content-Length 或上限多，立刻中止，不再往下读"""
+        limit = min(declared, self.max_bytes)
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    LIMITER.count(name, "too_large")
+                    raise HTTPException(status_code=413, detail=f"上传文件不能超过 {MAX_UPLOAD_MB:g} MB")
+            return message
+
+        return limited_receive
+
+    @staticmethod
+    async def reject(scope, receive, send, status_code: int, detail: str, headers: dict = None):
+        # 和 HTTPException 的返回格式保持一致
+        response = JSONResponse({"detail": detail}, status_code=status_code, headers=headers)
+        await response(scope, receive, send)
@@ -0,0 +1,262 @@
+import html
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Tuple
+
+from utils import cn_to_int
+
+# HTML 拆分：标签 / 实体 / 空白 / 普通文字
+TOKEN_PATTERN = re.compile(r'<[^>]*>|&#?\w+;|\s+|[^<&\s]+|[<&]')
+
+# 文档结构锚点：章节标题（可能已有 id）和法条开头的 <p><strong>第X条</strong>
+ANCHOR_PATTERN = re.compile(r'<h3([^>]*)>(.*?)</h3>|<p><strong>(第[零一二三四五六七八九十百千]+条)</strong>')
+ID_ATTR_PATTERN = re.compile(r'\bid="([^"]+)"')
+
+# 摘要中关键词前面保留的字数
+SNIPPET_LEAD = 20
+# 详情页最多高亮的命中数，避免常用字把整篇文档都标满
+MAX_HIGHLIGHTS = 300
+
+
+def split_terms(keyword: str) -> List[str]:
+    """把查询按空白拆成多个词（去重、转小写），例如 "征收 补偿" -> ["征收", "补偿"]"""
+    terms = []
+    for t in keyword.lower().split():
+        if t not in terms:
+            terms.append(t)
+    return terms
+
+
+class DocumentText:
+    """一篇文档的预处理结果：压缩空白后的纯文本，以及二元组位置倒排表
+
+    postings 的 key 是相邻两个字（小写），value 是它在 lower 中出现的所有起始位置。
+    查询词的位置由倒排表给出，不需要每次从头扫描全文。
+    从 HTML 构建时还会记录每个字在原 HTML 中的位置（offsets）和文档中的章节/法条锚点，
+    详情页据此直接把高亮插进原文，不用再解析一遍 HTML。
+    """
+    __slots__ = ("text", "lower", "postings", "offsets", "wide_chars", "anchors", "anchor_positions")
+
+    def __init__(self, text: str, offsets: array = None, wide_chars: Dict[int, int] = None):
+        self.text = text
+        self.lower = text.lower()
+        self.offsets = offsets if offsets is not None else array("I")
+        self.wide_chars = wide_chars or {}  # 由实体（如 &nbsp;）还原的字: {文本位置: HTML 结束位置}
+        self.anchors: List[Tuple[int, int, str, str, bool]] = []
+        self.anchor_positions: List[int] = []
+        postings: Dict[str, array] = {}
+        lower = self.lower
+        for i in range(len(lower) - 1):
+            gram = lower[i:i + 2]
+            p = postings.get(gram)
+            if p is None:
+                p = postings[gram] = array("I")
+            p.append(i)
+        self.postings = postings
+
+    @classmethod
+    def from_html(cls, content_html: str) -> "DocumentText":
+        """去掉标签、还原实体、把连续空白压成一个空格"""
+        parts = []
+        offsets = array("I")
+        wide_chars = {}
+        length = 0
+        pending_space = -1  # 待输出空格对应的 HTML 位置
+        for m in TOKEN_PATTERN.finditer(content_html):
+            token, start = m.group(), m.start()
+            if token.startswith("<") and len(token) > 1:
+                continue
+            if token.isspace():
+                if parts and pending_space < 0:
+                    pending_space = start
+                continue
+            if pending_space >= 0:
+                parts.append(" ")
+                offsets.append(pending_space)
+                length += 1
+                pending_space = -1
+            if token.startswith("&") and len(token) > 1:
+                char = html.unescape(token)
+                if char.isspace():
+                    char = " "
+                for ch in char:
+                    parts.append(ch)
+                    offsets.append(start)
+                    wide_chars[length] = m.end()
+                    length += 1
+                continue
+            parts.append(token)
+            offsets.extend(range(start, start + len(token)))
+            length += len(token)
+        doc = cls("".join(parts), offsets, wide_chars)
+        doc._collect_anchors(content_html)
+        return doc
+
+    def _collect_anchors(self, content_html: str):
+        """记录章节、小节和法条锚点: (HTML 位置, 文本位置, 锚点 id, 说明, 是否需要插入 id)"""
+        chapter = ""
+        seen_ids = set()
+        section_no = 0
+        for m in ANCHOR_PATTERN.finditer(content_html):
+            text_pos = bisect_left(self.offsets, m.start())
+            if m.group(3):
+                article = m.group(3)
+                anchor_id = f"art{cn_to_int(article[1:-1])}"
+                if anchor_id in seen_ids:
+                    continue
+                label = f"{chapter} {article}".strip()
+                # 在 "<p" 后面插入 id
+                self.anchors.append((m.start() + 2, text_pos, anchor_id, label, True))
+            else:
+                heading = re.sub(r'\s+', '', html.unescape(re.sub(r'<[^>]*>', '', m.group(2))))
+                id_match = ID_ATTR_PATTERN.search(m.group(1))
+                if id_match:
+                    anchor_id, inject = id_match.group(1), False
+                else:
+                    section_no += 1
+                    anchor_id, inject = f"sec{section_no}", True
+                chapter = heading
+                # 在 "<h3" 后面插入 id
+                self.anchors.append((m.start() + 3, text_pos, anchor_id, heading, inject))
+            seen_ids.add(anchor_id)
+        self.anchor_positions = [a[1] for a in self.anchors]
+
+    def anchor_at(self, text_pos: int):
+        """文本位置所在的最近一个锚点，没有则返回 None"""
+        i = bisect_right(self.anchor_positions, text_pos) - 1
+        return self.anchors[i] if i >= 0 else None
+
+    def html_runs(self, start: int, end: int) -> List[Tuple[int, int]]:
+        """文本区间 [start, end) 对应的 HTML 区间；跨越标签时拆成多段"""
+        runs = []
+        run_start = prev_end = -1
+        for k in range(start, end):
+            s = self.offsets[k]
+            e = self.wide_chars.get(k, s + 1)
+            if s != prev_end:
+                if run_start >= 0:
+                    runs.append((run_start, prev_end))
+                run_start = s
+            prev_end = e
+        if run_start >= 0:
+            runs.append((run_start, prev_end))
+        return runs
+
+    def __len__(self):
+        return len(self.text)
+
+    def positions(self, term: str) -> List[int]:
+        """查询词（小写）在正文中的所有起始位置"""
+        if not term:
+            return []
+        if len(term) == 1:
+            # 单字没有二元组可查，退回逐个查找
+            result, i = [], self.lower.find(term)
+            while i != -1:
+                result.append(i)
+                i = self.lower.find(term, i + 1)
+            return result
+        candidates = self.postings.get(term[:2], ())
+        if len(term) == 2:
+            return list(candidates)
+        return [p for p in candidates if self.lower.startswith(term, p)]
+
+    def term_positions(self, terms: List[str]) -> Dict[str, List[int]]:
+        return {t: self.positions(t) for t in terms}
+
+
+def _best_window(hits, width):
+    """在按位置排好序的命中列表中，找包含不同查询词最多（其次命中次数最多）的窗口"""
+    best = (0, 0, 0)  # (不同词数, 命中数, 窗口起点下标)
+    counts: Dict[str, int] = {}
+    left = 0
+    for right, (pos, term, _) in enumerate(hits):
+        counts[term] = counts.get(term, 0) + 1
+        while left < right and pos + len(term) - hits[left][0] > width:
+            lt = hits[left][1]
+            counts[lt] -= 1
+            if not counts[lt]:
+                del counts[lt]
+            left += 1
+        score = (len(counts), right - left + 1)
+        if score > best[:2]:
+            best = (score[0], score[1], left)
+    return best[2]
+
+
+def build_snippet(doc: DocumentText, term_positions: Dict[str, List[int]], length: int = 100) -> str:
+    """根据查询词位置生成摘要：选命中最密集的窗口，关键词用 <mark> 标出，其余文字做 HTML 转义"""
+    text = doc.text
+    hits = sorted(
+        (p, t, p + len(t)) for t, ps in term_positions.items() for p in ps
+    )
+    if not hits:
+        # 关键词只在标题里出现，正文里没有，就返回正文开头
+        return html.escape(text[:length]) + ("..." if len(text) > length else "")
+
+    first = hits[_best_window(hits, length - SNIPPET_LEAD)][0]
+    start = max(0, first - SNIPPET_LEAD)
+    end = min(len(text), start + length)
+
+    parts = ["..."] if start > 0 else []
+    cursor = start
+    for p, _, e in hits:
+        if p < cursor or e > end:
+            # 与前一个高亮重叠，或超出窗口
+            continue
+        parts.append(html.escape(text[cursor:p]))
+        parts.append(f"<mark>{html.escape(text[p:e])}</mark>")
+        cursor = e
+    parts.append(html.escape(text[cursor:end]))
+    if end < len(text):
+        parts.append("...")
+    return "".join(parts)
+
+
+def leading_snippet(doc: DocumentText, length: int = 100) -> str:
+    """无查询词时的默认摘要：正文开头"""
+    return build_snippet(doc, {}, length)
+
+
+def highlight_html(content_html: str, doc: DocumentText, term_positions: Dict[str, List[int]]):
+    """把锚点 id 和 <mark> 高亮插进原 HTML。
+
+    命中位置来自倒排表，HTML 位置来自预先记录的 offsets，只在插入点处切分字符串。
+    返回 (新的 HTML, 命中列表)，命中列表里每项包含 id、所在锚点和说明，供页面做上一个/下一个导航。
+    """
+    inserts = []  # (HTML 位置, 顺序, 插入内容)，同一位置先关闭再打开
+    for html_pos, _, anchor_id, _, inject in doc.anchors:
+        if inject:
+            inserts.append((html_pos, 1, f' id="{anchor_id}"'))
+
+    hits = []
+    cursor = 0
+    spans = sorted((p, p + len(t)) for t, ps in term_positions.items() for p in ps)
+    for p, e in spans:
+        if p < cursor:
+            continue  # 与前一个命中重叠
+        if len(hits) >= MAX_HIGHLIGHTS:
+            break
+        hit_id = f"hit-{len(hits)}"
+        for i, (s, t) in enumerate(doc.html_runs(p, e)):
+            attr = f' id="{hit_id}"' if i == 0 else ""
+            inserts.append((s, 2, f'<mark class="doc-hit"{attr}>'))
+            inserts.append((t, 0, "</mark>"))
+        anchor = doc.anchor_at(p)
+        hits.append({
+            "id": hit_id,
+            "anchor": anchor[2] if anchor else "",
+            "label": anchor[3] if anchor else "",
+        })
+        cursor = e
+
+    inserts.sort(key=lambda x: (x[0], x[1]))
+    parts = []
+    last = 0
+    for pos, _, s in inserts:
+        parts.append(content_html[last:pos])
+        parts.append(s)
+        last = pos
+    parts.append(content_html[last:])
+    return "".join(parts), hits
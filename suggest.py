@@ -0,0 +1,197 @@
+import re
+from functools import lru_cache
+from urllib.parse import quote
+from typing import Dict, List, Tuple
+
+from utils import load_json
+from corpus import get_corpus
+from catalog import get_case_catalog
+
+# 全局联想索引，首次调用 get_suggest_index() 时创建
+_SUGGEST_INDEX = None
+
+# 法规正文中的章节标题，例如 <h3 id="chap2">第二章　土地的所有权和使用权</h3>
+HEADING_PATTERN = re.compile(r'<h3 id="(chap\d+)">(.*?)</h3>')
+# 去掉标题前面的“第X章 / 第X节”编号，只留名称
+HEADING_NO_PATTERN = re.compile(r'^第[零一二三四五六七八九十百千]+(?:分编|[编章节])')
+
+# 不同来源的排序优先级，数字越小越靠前
+KIND_PRIORITY = {"law": 0, "case": 1, "keyword": 2, "heading": 3}
+
+# 每个前缀节点预先保存的候选数量
+TOP_K = 10
+# 模糊匹配的最低相似度（输入的三元组有多少比例出现在候选词里）
+FUZZY_THRESHOLD = 0.4
+# 法规标题的常见前缀，输入“民法典”也要能联想到“中华人民共和国民法典”
+TITLE_PREFIX = "中华人民共和国"
+
+
+class Suggestion:
+    """一条联想候选"""
+    __slots__ = ("text", "kind", "url", "detail")
+
+    def __init__(self, text: str, kind: str, url: str, detail: str = ""):
+        self.text = text
+        self.kind = kind
+        self.url = url
+        self.detail = detail
+
+    def to_dict(self) -> dict:
+        return {"text": self.text, "kind": self.kind, "url": self.url, "detail": self.detail}
+
+
+def normalize(text: str) -> str:
+    """统一大小写，去掉所有空白（含全角空格）"""
+    return re.sub(r'\s+', '', text).lower()
+
+
+def trigrams(text: str) -> set:
+    """生成带边界填充的三元组，短词也能参与相似度计算"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@lru_cache(maxsize=None)
+def load_pinyin():
+    """拼音索引依赖 pypinyin（已列在 requirements.txt 里），没装时拼音联想（如 zhaijidi）不生效
+    它的词典导入要一百多毫秒，所以等到构建索引时才导入"""
+    try:
+        from pypinyin import lazy_pinyin, Style
+    except ImportError:
+        return None, None
+    return lazy_pinyin, Style
+
+
+def pinyin_keys(text: str) -> List[str]:
+    """全拼和首字母两种拼音键，例如 宅基地 -> zhaijidi / zjd"""
+    lazy_pinyin, Style = load_pinyin()
+    if lazy_pinyin is None:
+        return []
+    full = "".join(lazy_pinyin(text))
+    initials = "".join(lazy_pinyin(text, style=Style.FIRST_LETTER))
+    # 没有汉字的词拼音和原文一样，不必重复插入
+    return [k.lower() for k in {full, initials} if k and k != text]
+
+
+class SuggestIndex:
+    """前缀树 + 三元组倒排表，构建时预先排好每个前缀的候选，查询时不扫描语料"""
+
+    def __init__(self, entries: List[Suggestion]):
+        self.entries: Tuple[Suggestion, ...] = tuple(entries)
+        # 前缀树节点: {字符: 子节点, "": 候选下标元组}
+        self.trie: dict = {}
+        self.gram_postings: Dict[str, List[int]] = {}
+
+        for i, entry in enumerate(self.entries):
+            key = normalize(entry.text)
+            keys = [key]
+            if key.startswith(TITLE_PREFIX) and len(key) > len(TITLE_PREFIX):
+                keys.append(key[len(TITLE_PREFIX):])
+            for k in list(keys):
+                keys.extend(pinyin_keys(k))
+            for k in keys:
+                self._insert(k, i)
+
+            for g in trigrams(key):
+                self.gram_postings.setdefault(g, []).append(i)
+
+        self._finalize(self.trie)
+
+    def _rank(self, i: int):
+        entry = self.entries[i]
+        return (KIND_PRIORITY.get(entry.kind, 9), len(entry.text), i)
+
+    def _insert(self, key: str, i: int):
+        node = self.trie
+        for ch in key:
+            node = node.setdefault(ch, {})
+            node.setdefault("", set()).add(i)
+
+    def _finalize(self, node: dict):
+        """把每个节点的候选集合排序并截断为 TOP_K，查询时直接返回"""
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            for ch, child in n.items():
+                if ch == "":
+                    continue
+                child[""] = tuple(sorted(child[""], key=self._rank)[:TOP_K])
+                stack.append(child)
+
+    def prefix(self, query: str) -> Tuple[int, ...]:
+        node = self.trie
+        for ch in query:
+            node = node.get(ch)
+            if node is None:
+                return ()
+        return node.get("", ())
+
+    def fuzzy(self, query: str, limit: int) -> List[int]:
+        """三元组相似度匹配，用于错别字，例如 征收补尝 -> 征收补偿"""
+        q_grams = trigrams(query)
+        shared: Dict[int, int] = {}
+        for g in q_grams:
+            for i in self.gram_postings.get(g, ()):
+                shared[i] = shared.get(i, 0) + 1
+
+        scored = []
+        for i, n in shared.items():
+            score = n / len(q_grams)
+            if score >= FUZZY_THRESHOLD:
+                scored.append((-score, self._rank(i), i))
+        scored.sort()
+        return [i for _, _, i in scored[:limit]]
+
+    def suggest(self, query: str, limit: int = 8) -> List[Suggestion]:
+        query = normalize(query)
+        if not query:
+            return []
+
+        ids = list(self.prefix(query)[:limit])
+        # 前缀结果不够时，再用模糊匹配补齐
+        if len(ids) < limit:
+            for i in self.fuzzy(query, limit):
+                if i not in ids:
+                    ids.append(i)
+                if len(ids) >= limit:
+                    break
+        return [self.entries[i] for i in ids]
+
+
+def collect_entries() -> List[Suggestion]:
+    """收集法规标题、法规章节标题、案例标题和案例关键词"""
+    entries = []
+    seen = set()
+
+    def add(text, kind, url, detail=""):
+        text = text.strip()
+        if not text or (kind, text) in seen:
+            return
+        seen.add((kind, text))
+        entries.append(Suggestion(text, kind, url, detail))
+
+    for law in load_json("data", "laws.json"):
+        add(law["title"], "law", f"/law/{law['id']}")
+        html_content = get_corpus("laws").read_text(f"{law['title']}.html")
+        if not html_content:
+            continue
+        for anchor, heading in HEADING_PATTERN.findall(html_content):
+            heading = re.sub(r'\s+', '', heading)
+            name = HEADING_NO_PATTERN.sub('', heading)
+            add(name, "heading", f"/law/{law['id']}#{anchor}", f"{law['title']} {heading}")
+
+    catalog = get_case_catalog()
+    for case in catalog.records:
+        add(case.title, "case", f"/case/detail/{case.case_no}", case.category)
+    for tag in catalog.tag_counts:
+        add(tag, "keyword", f"/case/?tags={quote(tag)}", f"{catalog.tag_counts[tag]} 个案例")
+
+    return entries
+
+
+def get_suggest_index() -> SuggestIndex:
+    """获取全局联想索引（首次调用时构建）"""
+    global _SUGGEST_INDEX
+    if _SUGGEST_INDEX is None:
+        _SUGGEST_INDEX = SuggestIndex(collect_entries())
+    return _SUGGEST_INDEX
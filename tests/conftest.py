@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# 测试直接导入项目根目录下的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session", autouse=True)
+def repo_root():
+    """目录、语料都按相对 data/ 的路径读取，测试在项目根目录下运行"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    old = os.getcwd()
+    os.chdir(root)
+    yield root
+    os.chdir(old)
@@ -0,0 +1,40 @@
+import csv
+import io
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import admin
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "secret")
+    app = FastAPI()
+    app.include_router(admin.api_admin, prefix="/admin")
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("value", ["=HYPERLINK(\"http://x\",\"点我\")", "+1+1", "-2", "@SUM(A1)", "\tx", "\rx"])
+def test_formula_cells_escaped(value):
+    assert admin.csv_cell("name", value) == "'" + value
+
+
+def test_plain_cells_unchanged():
+    assert admin.csv_cell("name", "张三") == "张三"
+    assert admin.csv_cell("dispute_type", "2") == "宅基地"
+    assert admin.csv_cell("book_time", "any") == "全天皆可"
+
+
+def test_csv_export_escapes_user_fields():
+    records = [{"name": "=1+2", "address": "@x", "description": "正常描述"}]
+    _, _, columns = admin.DATASETS["submissions"]
+    text = "".join(admin.iter_csv(records, columns)).lstrip("﻿")
+    row = dict(zip(*csv.reader(io.StringIO(text))))
+    assert (row["姓名"], row["地址"], row["纠纷描述"]) == ("'=1+2", "'@x", "正常描述")
+
+
+def test_dispute_type_rejected_for_appointments(client):
+    r = client.get("/admin/export/appointments", params={"dispute_type": "1", "token": "secret"})
+    assert r.status_code == 400
@@ -0,0 +1,42 @@
+import json
+
+from booking import SlotIndex
+
+
+def make_index(tmp_path, appointments=None):
+    if appointments is not None:
+        (tmp_path / "appointments.json").write_text(json.dumps(appointments, ensure_ascii=False), encoding="utf-8")
+    return SlotIndex(str(tmp_path / "slots.db"), str(tmp_path), "appointments.json")
+
+
+def booking(slot, date="2026-03-08", mediator="张建国"):
+    return {"target_mediator": mediator, "name": "李四", "book_date": date, "book_time": slot}
+
+
+def test_reserve_is_visible_to_other_instances(tmp_path):
+    # 两个实例相当于两个 worker 进程
+    a, b = make_index(tmp_path), make_index(tmp_path)
+    assert b.free_slots("张建国", "2026-03-08") == {"morning": True, "afternoon": True}
+    assert a.reserve(booking("morning")) == "morning"
+    assert b.free_slots("张建国", "2026-03-08") == {"morning": False, "afternoon": True}
+    assert b.reserve(booking("morning")) is None
+    assert b.reserve(booking("any")) == "afternoon"
+    assert a.reserve(booking("any")) is None
+
+
+def test_reserve_appends_to_json(tmp_path):
+    index = make_index(tmp_path)
+    index.reserve(booking("any", mediator="王芳"))
+    saved = json.loads((tmp_path / "appointments.json").read_text(encoding="utf-8"))
+    assert [(x["target_mediator"], x["assigned_time"]) for x in saved] == [("王芳", "morning")]
+
+
+def test_existing_appointments_imported(tmp_path):
+    # 旧数据里“全天皆可”的预约占用剩下的上午
+    index = make_index(tmp_path, [booking("afternoon"), booking("any")])
+    assert index.free_slots("张建国", "2026-03-08") == {"morning": False, "afternoon": False}
+    assert index.free_slots("张建国", "2026-03-09") == {"morning": True, "afternoon": True}
+
+
+def test_unknown_slot_rejected(tmp_path):
+    assert make_index(tmp_path).reserve(booking("evening")) is None
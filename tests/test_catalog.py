@@ -0,0 +1,105 @@
+import itertools
+
+import pytest
+
+from catalog import CaseCatalog, CaseRecord, load_case_catalog
+from pagination import paginate
+from search_index import DocumentText
+from utils import load_json
+
+CATEGORIES = ["民事", "行政", "刑事"]
+TAGS = ["征收补偿", "宅基地", "合同", "妇女权益保障"]
+
+
+def make_catalog(n=37):
+    records = []
+    for i in range(n):
+        raw = {
+            "id": i // len(CATEGORIES) + 1,
+            "case_no": f"20{20 + i % 6}-{i:03d}",
+            "title": f"案例{i}",
+            "filename": f"case{i}",
+            # 每个案例带 0~3 个标签，覆盖各种组合
+            "keywords": [t for k, t in enumerate(TAGS) if (i >> k) & 1][:3],
+        }
+        records.append(CaseRecord(raw, CATEGORIES[i % len(CATEGORIES)], DocumentText.from_html(f"<p>正文{i}</p>")))
+    return CaseCatalog(records)
+
+
+def brute_force(catalog, category, tags, mode):
+    """逐条检查，和位图的结果对照"""
+    tags = [t for t in tags if t]
+    result = []
+    for r in catalog.records:
+        if category != "全部" and r.category != category:
+            continue
+        if tags:
+            found = [t in r.keywords for t in tags]
+            if not (any(found) if mode == "or" else all(found)):
+                continue
+        result.append(r)
+    return result
+
+
+def test_every_case_reachable_by_category_and_id():
+    raw = load_json("data", "cases.json")
+    catalog = load_case_catalog()
+    expected = [(cg, case["id"]) for cg, cases in raw.items() for case in cases]
+    assert len(catalog.by_id) == len(catalog.records) == len(expected)
+    for cg, case_id in expected:
+        record = catalog.get_by_id(cg, case_id)
+        assert (record.category, record.id) == (cg, case_id)
+
+
+def test_same_id_in_different_categories():
+    catalog = load_case_catalog()
+    categories = list(catalog.by_category)
+    assert len(categories) > 1
+    first = [catalog.get_by_id(cg, 1) for cg in categories]
+    assert all(first) and len({r.case_no for r in first}) == len(categories)
+
+
+# --- 位图筛选与分页 ---
+@pytest.mark.parametrize("category", ["全部", "民事", "行政", "不存在的分类"])
+@pytest.mark.parametrize("mode", ["and", "or"])
+def test_filter_bits_matches_brute_force(category, mode):
+    catalog = make_catalog()
+    for n in range(len(TAGS) + 1):
+        for tags in itertools.combinations(TAGS + ["没有的标签"], n):
+            bits = catalog.filter_bits(category, tags, mode)
+            assert catalog.records_for(bits) == brute_force(catalog, category, tags, mode), (tags, mode)
+
+
+def test_filter_bits_ignores_empty_tags():
+    catalog = make_catalog()
+    assert catalog.filter_bits("民事", ["", ""]) == catalog.category_bits["民事"]
+
+
+def test_records_in_case_no_order():
+    catalog = make_catalog()
+    case_nos = [r.case_no for r in catalog.records_for(catalog.all_bits)]
+    assert case_nos == sorted(case_nos, reverse=True)
+
+
+@pytest.mark.parametrize("page_size", [10, 20, 50, 7])
+def test_page_for_matches_paginate(page_size):
+    catalog = make_catalog()
+    for tags, mode in [((), "and"), (("合同",), "and"), (("宅基地", "合同"), "or"), (("没有的标签",), "and")]:
+        bits = catalog.filter_bits("全部", tags, mode)
+        expected_all = catalog.records_for(bits)
+        for page in range(0, 7):
+            got = catalog.page_for(bits, page, page_size)
+            expected = paginate(expected_all, page, page_size)
+            assert (got.items, got.page, got.page_size, got.total) == \
+                   (list(expected.items), expected.page, expected.page_size, expected.total)
+
+
+def test_facet_counts():
+    catalog = make_catalog()
+    bits = catalog.filter_bits("行政")
+    expected = {}
+    for r in catalog.records_for(bits):
+        for t in r.keywords:
+            expected[t] = expected.get(t, 0) + 1
+    assert catalog.facet_counts(bits) == expected
+    assert list(catalog.facet_counts(bits).values()) == sorted(expected.values(), reverse=True)
@@ -0,0 +1,40 @@
+from citations import parse_citations
+
+
+def section(*paragraphs):
+    body = "".join(f"<p>{p}</p>" for p in paragraphs)
+    return f"<div><h3>基本案情</h3><p>《无关法》第1条</p><h3>关联索引</h3>{body}<h3>一审</h3></div>"
+
+
+def test_basic_and_chinese_numerals():
+    html = section("《中华人民共和国民法典》第509条、第一百二十条")
+    assert parse_citations(html) == [("中华人民共和国民法典", [509, 120])]
+
+
+def test_only_index_section_is_parsed():
+    assert parse_citations("<h3>基本案情</h3><p>《刑法》第1条</p>") == []
+
+
+def test_paragraph_and_item_suffixes():
+    html = section("《中华人民共和国民事诉讼法》第237条第2款、第251条第1款第3项和第253条")
+    assert parse_citations(html) == [("中华人民共和国民事诉讼法", [237, 251, 253])]
+
+
+def test_parenthesised_old_law_ignored():
+    html = section("《中华人民共和国民法典》第243条（本案适用的是《中华人民共和国物权法》第42条）")
+    assert parse_citations(html) == [("中华人民共和国民法典", [243])]
+
+
+def test_nested_title_kept():
+    html = section("《最高人民法院关于适用<中华人民共和国行政诉讼法>若干问题的解释》第14条、第15条")
+    assert parse_citations(html) == [("最高人民法院关于适用〈中华人民共和国行政诉讼法〉若干问题的解释", [14, 15])]
+
+
+def test_inline_tags_and_entities():
+    html = section("《中华人民共和国<b>刑法</b>》&nbsp;第<span>266</span>条")
+    assert parse_citations(html) == [("中华人民共和国刑法", [266])]
+
+
+def test_multiple_laws_in_one_paragraph():
+    html = section("《中华人民共和国行政复议法》第4条、第62条；《中华人民共和国行政诉讼法》第26条")
+    assert parse_citations(html) == [("中华人民共和国行政复议法", [4, 62]), ("中华人民共和国行政诉讼法", [26])]
@@ -0,0 +1,99 @@
+import os
+import zlib
+
+import pytest
+
+import corpus
+from corpus import Corpus, build_pack
+
+
+@pytest.fixture
+def source(tmp_path):
+    src = tmp_path / "src"
+    (src / "民事").mkdir(parents=True)
+    files = {
+        "民事/合同纠纷.html": "<p>合同</p>".encode("utf-8") * 100,
+        "民事/空文件.html": b"",
+        "法规.html": "中华人民共和国民法典".encode("utf-8"),
+        "二进制.bin": bytes(range(256)) * 3,
+    }
+    for key, data in files.items():
+        (src / key).write_bytes(data)
+    return src, files
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    # 每个测试用独立的缓存，互不影响
+    monkeypatch.setattr(corpus, "DOCUMENT_CACHE", corpus.DocumentCache(1024 * 1024))
+
+
+def test_pack_round_trip(source, tmp_path):
+    src, files = source
+    pack = str(tmp_path / "test.pack")
+    count, raw_size, packed_size = build_pack(str(src), pack)
+    assert count == len(files)
+    assert raw_size == sum(len(d) for d in files.values())
+    assert packed_size == os.path.getsize(pack)
+    assert not os.path.exists(pack + ".tmp")
+
+    # 删掉散文件，确认内容都是从包里读出来的
+    for key in files:
+        os.remove(src / key)
+    c = Corpus("test", str(src), pack)
+    try:
+        assert c.packed and set(c.index) == set(files)
+        for key, data in files.items():
+            assert c.exists(key)
+            assert c.read_bytes(key) == data
+        assert c.read_text("法规.html") == "中华人民共和国民法典"
+        assert c.read_bytes("不存在.html") is None
+        assert c.read_text("不存在.html", "默认") == "默认"
+    finally:
+        c.close()
+
+
+def test_entries_are_independent_zlib_streams(source, tmp_path):
+    src, files = source
+    pack = str(tmp_path / "test.pack")
+    build_pack(str(src), pack)
+    c = Corpus("test", str(src), pack)
+    try:
+        with open(pack, "rb") as f:
+            raw = f.read()
+        for key, (offset, length, size) in c.index.items():
+            start = c.data_start + offset
+            assert zlib.decompress(raw[start:start + length]) == files[key]
+            assert size == len(files[key])
+    finally:
+        c.close()
+
+
+def test_loose_files_used_when_not_packed(source, tmp_path):
+    src, files = source
+    c = Corpus("test", str(src), str(tmp_path / "missing.pack"))
+    assert not c.packed
+    assert c.read_bytes("民事/合同纠纷.html") == files["民事/合同纠纷.html"]
+    # 打包之后新加的散文件也能读到
+    (src / "新增.html").write_bytes(b"new")
+    assert c.read_bytes("新增.html") == b"new"
+
+
+def test_not_a_pack(tmp_path):
+    bad = tmp_path / "bad.pack"
+    bad.write_bytes(b"XXXX\x00\x00\x00\x00")
+    with pytest.raises(ValueError):
+        Corpus("test", str(tmp_path), str(bad))
+
+
+def test_document_cache_evicts_least_recently_used():
+    cache = corpus.DocumentCache(10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"   # a 变成最近使用
+    cache.put("c", b"1234")
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+    assert cache.size == 8
+    cache.put("big", b"x" * 11)         # 比上限还大的不缓存
+    assert cache.get("big") is None and cache.size == 8
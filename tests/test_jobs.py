@@ -0,0 +1,53 @@
+import hashlib
+import time
+
+import jobs
+
+
+def test_unreadable_image_keeps_size_and_hash(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "THUMBNAIL_DIR", str(tmp_path / "thumbs"))
+    path = tmp_path / "photo.png"
+    path.write_bytes(b"not really a png")
+    meta = jobs.process_file(str(path))
+    assert meta["size"] == 16
+    assert meta["sha256"] == hashlib.sha256(b"not really a png").hexdigest()
+    assert meta["warning"] == "图片无法解析" and meta["error"]
+    assert "thumbnail" not in meta
+
+
+def test_failed_job_reported(tmp_path, monkeypatch):
+    db = str(tmp_path / "jobs.db")
+    monkeypatch.setattr(jobs, "JOBS_DB_PATH", db)
+    monkeypatch.setattr(jobs.connect, "__defaults__", (db,))
+    conn = jobs.connect()
+    conn.execute("INSERT INTO jobs (path, status, error, next_run, updated) VALUES ('a', 'failed', 'boom', 0, 0)")
+    conn.execute("INSERT INTO file_meta (path, meta) VALUES ('b', '{\"size\": 1}')")
+    conn.close()
+    assert jobs.get_file_meta(["a", "b", "c"]) == {"a": {"failed": True, "error": "boom"}, "b": {"size": 1}}
+
+
+def test_runner_requeues_jobs_left_running(tmp_path, monkeypatch):
+    # 模拟任务进程崩溃后留下的 running 任务：运行中的执行器会定期把它放回队列
+    db = str(tmp_path / "jobs.db")
+    monkeypatch.setattr(jobs, "JOBS_DB_PATH", db)
+    monkeypatch.setattr(jobs.connect, "__defaults__", (db,))
+    monkeypatch.setattr(jobs, "UPLOAD_DIRS", ())
+    monkeypatch.setattr(jobs, "POLL_INTERVAL", 0.05)
+    monkeypatch.setattr(jobs, "SWEEP_INTERVAL", 0.1)
+    monkeypatch.setattr(jobs, "STALE_AFTER", 0.2)
+    path = tmp_path / "a.txt"
+    path.write_text("abc")
+
+    runner = jobs.JobRunner(workers=1)
+    runner.start()
+    try:
+        conn = jobs.connect()
+        conn.execute("INSERT INTO jobs (path, status, next_run, updated) VALUES (?, 'running', 0, ?)",
+                     (str(path), time.time()))
+        deadline = time.time() + 10
+        while not jobs.get_file_meta([str(path)]) and time.time() < deadline:
+            time.sleep(0.1)
+        assert jobs.get_file_meta([str(path)])[str(path)]["size"] == 3
+        conn.close()
+    finally:
+        runner.stop()
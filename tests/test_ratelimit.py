@@ -0,0 +1,22 @@
+import pytest
+from starlette.requests import Request
+
+import ratelimit
+
+
+def make_request(forwarded=None, peer="10.0.0.1"):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "headers": headers, "client": (peer, 1234)})
+
+
+@pytest.mark.parametrize("hops, forwarded, expected", [
+    (0, "1.1.1.1", "10.0.0.1"),
+    # 客户端自己伪造的 9.9.9.9 在左边，不能用
+    (1, "9.9.9.9, 1.1.1.1", "1.1.1.1"),
+    (1, None, "10.0.0.1"),
+    (2, "9.9.9.9, 1.1.1.1, 172.16.0.5", "1.1.1.1"),
+    (2, "1.1.1.1", "1.1.1.1"),
+])
+def test_client_ip_uses_trusted_hops(monkeypatch, hops, forwarded, expected):
+    monkeypatch.setattr(ratelimit, "PROXY_HOPS", hops)
+    assert ratelimit.client_ip(make_request(forwarded)) == expected
@@ -0,0 +1,118 @@
+import html
+import re
+
+import pytest
+
+import search_index
+from search_index import DocumentText, build_snippet, highlight_html, split_terms
+
+MARK_PATTERN = re.compile(r'<mark class="doc-hit"( id="hit-\d+")?>(.*?)</mark>', re.S)
+
+
+def visible(fragment):
+    """标签去掉、实体还原、空白压缩后的文字"""
+    return re.sub(r"\s+", " ", html.unescape(re.sub(r"<[^>]*>", "", fragment)))
+
+
+def highlight(content, query, terms=None):
+    doc = DocumentText.from_html(content)
+    return highlight_html(content, doc, doc.term_positions(terms or split_terms(query)))
+
+
+def marked_texts(out):
+    """每个命中被高亮的文字（跨标签拆成几段的拼回去）"""
+    texts = []
+    for m in MARK_PATTERN.finditer(out):
+        if m.group(1):
+            texts.append("")
+        texts[-1] += visible(m.group(2))
+    return texts
+
+
+# --- DocumentText.from_html ---
+def test_text_strips_tags_unescapes_and_collapses_space():
+    doc = DocumentText.from_html("<p>第一条\n   A&amp;B</p>\n<p>征收&nbsp;补偿</p>")
+    assert doc.text == "第一条 A&B 征收 补偿"
+
+
+def test_offsets_point_at_source_characters():
+    content = "<h3>总则</h3>\n<p>征<b>收</b>  补偿 &lt;x&gt;</p>"
+    doc = DocumentText.from_html(content)
+    assert len(doc.offsets) == len(doc.text)
+    for k, ch in enumerate(doc.text):
+        start = doc.offsets[k]
+        if k in doc.wide_chars:
+            assert html.unescape(content[start:doc.wide_chars[k]]) == ch
+        elif ch == " ":
+            assert content[start].isspace()
+        else:
+            assert content[start] == ch
+
+
+def test_positions_match_plain_find():
+    doc = DocumentText.from_html("<p>补偿款补偿协议，补偿</p>")
+    assert doc.positions("补偿") == [0, 3, 8]
+    assert doc.positions("补偿协") == [3]
+    assert doc.positions("款") == [2]
+    assert doc.positions("") == []
+
+
+# --- highlight_html ---
+@pytest.mark.parametrize("content, query", [
+    ("<p>关于征收补偿的规定，征收应当补偿。</p>", "征收"),
+    ("<p>征<b>收</b>补偿</p>", "征收补偿"),
+    ("<p>A&amp;B 公司</p>", "a&b"),
+    # 查询词本身不带空白（split_terms 会拆开），这里直接给出跨越空白的词
+    ("<p>征收&nbsp;补偿</p>", "收 补"),
+    ("<p>征收\n    补偿</p>", "收 补"),
+    ("<p>征收</p>\n<p>补偿</p>", "收 补"),
+    ("<p>FOO bar Foo</p>", "foo"),
+])
+def test_each_mark_wraps_exactly_the_query(content, query):
+    out, hits = highlight(content, query, [query])
+    texts = marked_texts(out)
+    assert texts and all(t.lower() == query for t in texts)
+    assert len(hits) == len(texts)
+    # 去掉插入的高亮之后和原文完全一样
+    assert re.sub(r'<mark class="doc-hit"[^>]*>|</mark>', "", out) == content
+
+
+def test_mark_split_across_tags_keeps_nesting():
+    out, _ = highlight("<p>征<b>收</b>补偿</p>", "征收")
+    assert out == '<p><mark class="doc-hit" id="hit-0">征</mark><b><mark class="doc-hit">收</mark></b>补偿</p>'
+
+
+def test_entity_is_not_cut():
+    out, _ = highlight("<p>A&amp;B</p>", "&")
+    assert out == '<p>A<mark class="doc-hit" id="hit-0">&amp;</mark>B</p>'
+
+
+def test_overlapping_terms_marked_once():
+    out, hits = highlight("<p>征收补偿</p>", "征收 收补")
+    assert marked_texts(out) == ["征收"]
+    assert len(hits) == 1
+
+
+def test_anchor_ids_injected_and_hits_labelled():
+    content = ('<h3>第一章 总则</h3><p><strong>第一条</strong>为了规范征收。</p>'
+               '<h3 id="fz">附则</h3><p><strong>第十二条</strong>征收自公布之日起施行。</p>')
+    out, hits = highlight(content, "征收")
+    assert '<h3 id="sec1">第一章 总则</h3>' in out
+    assert '<p id="art1"><strong>第一条</strong>' in out
+    assert '<p id="art12"><strong>第十二条</strong>' in out
+    # 已有 id 的标题不再插入
+    assert '<h3 id="fz">附则</h3>' in out
+    assert [(h["anchor"], h["label"]) for h in hits] == [("art1", "第一章总则 第一条"), ("art12", "附则 第十二条")]
+
+
+def test_highlights_capped(monkeypatch):
+    monkeypatch.setattr(search_index, "MAX_HIGHLIGHTS", 3)
+    out, hits = highlight("<p>" + "征收，" * 10 + "</p>", "征收")
+    assert len(hits) == 3 and len(marked_texts(out)) == 3
+
+
+# --- build_snippet ---
+def test_snippet_marks_and_escapes():
+    doc = DocumentText.from_html("<p>甲方 &lt;公司&gt; 负责征收补偿</p>")
+    snippet = build_snippet(doc, doc.term_positions(["征收"]))
+    assert snippet == "甲方 &lt;公司&gt; 负责<mark>征收</mark>补偿"
@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+from utils import save_json_append, iter_json_array
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def dump(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+
+
+# --- save_json_append ---
+def test_append_creates_missing_file(tmp_path):
+    save_json_append({"a": 1}, str(tmp_path), "x.json")
+    assert json.loads(read(tmp_path / "x.json")) == [{"a": 1}]
+
+
+def test_append_to_empty_array(tmp_path):
+    (tmp_path / "x.json").write_text("[]", encoding="utf-8")
+    save_json_append({"a": 1}, str(tmp_path), "x.json")
+    assert json.loads(read(tmp_path / "x.json")) == [{"a": 1}]
+
+
+def test_append_matches_json_dump(tmp_path):
+    records = [{"name": "张三", "files": ["a.jpg", "b.pdf"]}, {"note": "含 ] 和 [ 的文字", "n": None}]
+    dump(tmp_path / "x.json", records[:1])
+    save_json_append(records[1], str(tmp_path), "x.json")
+    # 追加后和整份 json.dump 的结果逐字节一致
+    dump(tmp_path / "expected.json", records)
+    assert read(tmp_path / "x.json") == read(tmp_path / "expected.json")
+
+
+def test_append_then_reread_many(tmp_path):
+    expected = []
+    for i in range(50):
+        record = {"i": i, "text": "]" * (i % 3) + "\n中文"}
+        save_json_append(record, str(tmp_path), "x.json")
+        expected.append(record)
+    assert json.loads(read(tmp_path / "x.json")) == expected
+
+
+def test_append_tolerates_trailing_whitespace(tmp_path):
+    (tmp_path / "x.json").write_text('[\n    {"a": 1}\n]\n\n  ', encoding="utf-8")
+    save_json_append({"b": 2}, str(tmp_path), "x.json")
+    assert json.loads(read(tmp_path / "x.json")) == [{"a": 1}, {"b": 2}]
+
+
+def test_append_rejects_non_array(tmp_path):
+    (tmp_path / "x.json").write_text('{"a": 1}', encoding="utf-8")
+    with pytest.raises(ValueError):
+        save_json_append({"b": 2}, str(tmp_path), "x.json")
+
+
+# --- iter_json_array ---
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, 64 * 1024])
+def test_iter_chunk_boundaries(tmp_path, chunk_size):
+    # 块大小从 1 字节起，记录必然被切断在各种位置：字符串中间、转义符、多字节汉字、嵌套结构
+    records = [
+        {"i": i, "s": "中文" * i, "nested": [1, {"x": "]"}], "q": 'a,"]\\'}
+        for i in range(30)
+    ]
+    dump(tmp_path / "x.json", records)
+    assert list(iter_json_array(str(tmp_path), "x.json", chunk_size)) == records
+
+
+@pytest.mark.parametrize("text", ["[]", "[ ]", "  [\n]\n"])
+def test_iter_empty_array(tmp_path, text):
+    (tmp_path / "x.json").write_text(text, encoding="utf-8")
+    assert list(iter_json_array(str(tmp_path), "x.json", 1)) == []
+
+
+def test_iter_missing_file(tmp_path):
+    assert list(iter_json_array(str(tmp_path), "missing.json")) == []
+
+
+def test_iter_brackets_inside_strings(tmp_path):
+    records = [{"a": "]"}, {"b": "[,]"}, {"c": "\"]\""}]
+    (tmp_path / "x.json").write_text(json.dumps(records), encoding="utf-8")
+    assert list(iter_json_array(str(tmp_path), "x.json", 3)) == records
+
+
+def test_iter_reads_appended_file(tmp_path):
+    expected = []
+    for i in range(20):
+        record = {"i": i, "note": "]" if i % 2 else "中文"}
+        save_json_append(record, str(tmp_path), "x.json")
+        expected.append(record)
+    assert list(iter_json_array(str(tmp_path), "x.json", 5)) == expected
+
+
+def test_iter_rejects_non_array(tmp_path):
+    (tmp_path / "x.json").write_text('{"a": 1}', encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_json_array(str(tmp_path), "x.json"))
+
+
+def test_iter_truncated_file(tmp_path):
+    (tmp_path / "x.json").write_text('[{"a": 1}, {"b": ', encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_json_array(str(tmp_path), "x.json", 4))
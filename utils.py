@@ -1,8 +1,9 @@
 import os
 import json
-from PIL import Image, ImageDraw, ImageFont # 核心画图库
+import time
+import sqlite3
+import threading
 import random
-import re
 
 def load_json(dir: str, filename: str):
     file_path = os.path.join(dir, filename)
@@ -12,11 +13,53 @@ def load_json(dir: str, filename: str):
         return json.load(f)
 
 # 格式: { "uuid_string": "XY7Z", ... }
+# 多进程部署时换成 SqliteCaptchaStore，否则 A 进程出的验证码到 B 进程验证不了
 CAPTCHA_STORE = {}
 
+
+class SqliteCaptchaStore:
+    """多个 worker 进程共用的验证码存储，用法和字典一样"""
+    # 超过这么久没被验证的验证码直接清掉（秒）
+    EXPIRE = 3600
+
+    def __init__(self, path: str):
+        self.path = path
+        self.local = threading.local()
+        conn = sqlite3.connect(path, timeout=5)
+        conn.execute("CREATE TABLE IF NOT EXISTS captcha (uid TEXT PRIMARY KEY, text TEXT, created REAL)")
+        conn.commit()
+        conn.close()
+
+    def _conn(self) -> sqlite3.Connection:
+        # 连接不能跨线程，也不能跨 fork 使用，按 (进程, 线程) 各开一个
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self.local.conn, self.local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, uid, default=None):
+        row = self._conn().execute("SELECT text FROM captcha WHERE uid = ?", (uid,)).fetchone()
+        return row[0] if row else default
+
+    def __setitem__(self, uid, text):
+        now = time.time()
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO captcha (uid, text, created) VALUES (?, ?, ?)", (uid, text, now))
+        conn.execute("DELETE FROM captcha WHERE created < ?", (now - self.EXPIRE,))
+
+    def __delitem__(self, uid):
+        if not self._conn().execute("DELETE FROM captcha WHERE uid = ?", (uid,)).rowcount:
+            raise KeyError(uid)
+
+    def items(self):
+        return self._conn().execute("SELECT uid, text FROM captcha").fetchall()
+
 # --- 辅助函数：生成随机验证码图片 ---
 def create_captcha_image(text):
     """画一张带干扰线和噪点的验证码"""
+    # 核心画图库；只有验证码用到，放在这里导入，不画验证码的进程不用加载 Pillow
+    from PIL import Image, ImageDraw, ImageFont
     width, height = 120, 50
     # 1. 创建灰色背景图片 (RGB颜色: 230, 230, 230)
     image = Image.new('RGB', (width, height), (230, 230, 230))
@@ -67,53 +110,109 @@ def traverse_captcha():
         print(f"{uid}: {text}")
 
 def save_json_append(data, dir: str, filename: str):
+    """往 JSON 数组文件末尾追加一条记录。
+
+    不再整份读出再写回：直接定位到文件末尾的 "]"，在它前面写入新记录，
+    耗时和历史记录多少无关，文件格式与 json.dump(indent=4) 保持一致。
+    """
     file_path = os.path.join(dir, filename)
     # 如果文件不存在，先建个空的
     if not os.path.exists(file_path):
         with open(file_path, "w", encoding="utf-8") as f:
             json.dump([], f)
-    
-    # 读取旧数据
+
+    # 新记录缩进一层，和 indent=4 的数组元素对齐
+    item = json.dumps(data, ensure_ascii=False, indent=4).replace("\n", "\n    ")
+
+    with open(file_path, "r+b") as f:
+        # 从末尾往回找数组的 "]"，以及它前面最后一个非空白字符
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        close_found = False
+        prev_char = prev_pos = None
+        while pos > 0:
+            step = min(256, pos)
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step)
+            for i in range(len(chunk) - 1, -1, -1):
+                ch = chunk[i:i + 1]
+                if ch.isspace():
+                    continue
+                if not close_found:
+                    if ch != b"]":
+                        raise ValueError(f"{file_path} 不是 JSON 数组")
+                    close_found = True
+                else:
+                    prev_char, prev_pos = ch, pos + i
+                    break
+            if prev_char is not None:
+                break
+
+        if prev_char is None:
+            raise ValueError(f"{file_path} 不是 JSON 数组")
+        # prev_char 是 "[" 说明数组为空，不需要逗号
+        sep = "\n" if prev_char == b"[" else ",\n"
+        f.seek(prev_pos + 1)
+        f.truncate()
+        f.write(f"{sep}    {item}\n]".encode("utf-8"))
+
+def iter_json_array(dir: str, filename: str, chunk_size: int = 64 * 1024):
+    """逐条读取 JSON 数组文件（生成器），内存里只保留当前这一条记录，文件多大都不怕"""
+    file_path = os.path.join(dir, filename)
+    if not os.path.exists(file_path):
+        return
+    decoder = json.JSONDecoder()
     with open(file_path, "r", encoding="utf-8") as f:
-        submissions = json.load(f)
-    
-    # 追加新数据
-    submissions.append(data)
-    
-    # 写入
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(submissions, f, ensure_ascii=False, indent=4)
-
-def remove_html_tags(text):
-    """把 HTML 字符串转为纯文本"""
-    clean = re.compile('<.*?>')
-    return re.sub(clean, '', text)
-
-# 生成智能摘要
-def generate_smart_snippet(content_html, keyword, length=100):
-    """
-    从 HTML 内容中提取包含 keyword 的纯文本片段。
-    如果没找到 keyword，就返回开头的内容。
-    """
-    # 转纯文本
-    plain_text = remove_html_tags(content_html)
-    # print(plain_text)
-    # 去除多余的空行和空格，让摘要更紧凑
-    plain_text = re.sub(r'\s+', ' ', plain_text).strip()
-    # print(plain_text)
-
-    if not keyword:
-        return plain_text[:length] + "..." if length != -1 else plain_text
-
-    # 查找关键词位置 (忽略大小写)
-    idx = plain_text.lower().find(keyword.lower())
-
-    if idx != -1:
-        # 截取：关键词前面留 20 字，后面留 80 字
-        start = max(0, idx - 20)
-        end = min(len(plain_text), idx + 80)
-        snippet = plain_text[start:end]
-        return "..." + snippet + "..."
-    else:
-        # 如果关键词只在标题里出现，正文里没找到，就返回正文开头
-        return plain_text[:length] + "..."
\ No newline at end of file
+        buf, pos, started, eof = "", 0, False, False
+        while True:
+            # 跳过空白，必要时继续读
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos >= len(buf):
+                if eof:
+                    return
+                buf, pos = f.read(chunk_size), 0
+                eof = not buf
+                continue
+
+            ch = buf[pos]
+            if not started:
+                if ch != "[":
+                    raise ValueError(f"{file_path} 不是 JSON 数组")
+                started = True
+                pos += 1
+            elif ch == "]":
+                return
+            elif ch == ",":
+                pos += 1
+            else:
+                try:
+                    obj, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    # 记录被截断在两块之间，读下一块接上再试
+                    more = f.read(chunk_size)
+                    if not more:
+                        raise
+                    buf, pos = buf[pos:] + more, 0
+                    continue
+                yield obj
+                pos = end
+                # 已经处理过的部分丢掉，避免缓冲区一直变大
+                if pos > chunk_size:
+                    buf, pos = buf[pos:], 0
+
+CN_DIGITS = {"零": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+CN_UNITS = {"十": 10, "百": 100, "千": 1000}
+
+def cn_to_int(text: str) -> int:
+    """中文数字转整数，例如 "二百零八" -> 208，"十二" -> 12"""
+    total, digit = 0, 0
+    for ch in text:
+        if ch in CN_DIGITS:
+            digit = CN_DIGITS[ch]
+        elif ch in CN_UNITS:
+            # "十二" 这种省略了“一”的写法
+            total += (digit or 1) * CN_UNITS[ch]
+            digit = 0
+    return total + digit
@@ -0,0 +1,116 @@
+import gc
+import time
+from typing import Iterable
+
+from fastapi.templating import Jinja2Templates
+
+import catalog
+import suggest
+import citations
+import booking
+from api import policy
+from catalog import get_law_catalog, get_case_catalog
+from suggest import get_suggest_index
+from citations import get_citation_graph
+from booking import get_slot_index, get_mediator_matcher
+from api.policy import get_policies
+from corpus import reset_corpora, restore_corpora
+
+# 预热状态，/readyz 直接返回它
+STATE = {
+    "ready": False,
+    "error": None,
+    "steps": {},            # 每一步耗时（秒）
+    "import_to_ready": None  # 从导入 main 到预热完成的总耗时（秒）
+}
+
+# 预热时加载的全局对象 (模块, 变量名)，重新加载前清空
+LOADED_GLOBALS = [
+    (catalog, "_CASE_CATALOG"),
+    (catalog, "_LAW_CATALOG"),
+    (suggest, "_SUGGEST_INDEX"),
+    (citations, "_CITATION_GRAPH"),
+    (policy, "_POLICIES"),
+    (booking, "_SLOT_INDEX"),
+    (booking, "_MEDIATOR_MATCHER"),
+]
+
+# 按依赖顺序排列：联想索引要用到案例目录
+WARMUP_STEPS = [
+    ("law_catalog", get_law_catalog),
+    ("case_catalog", get_case_catalog),
+    ("suggest_index", get_suggest_index),
+    ("citation_graph", get_citation_graph),
+    ("policies", get_policies),
+    ("slot_index", get_slot_index),
+    ("mediator_matcher", get_mediator_matcher),
+]
+
+
+def compile_templates(all_templates: Iterable[Jinja2Templates]) -> int:
+    """把模板预先编译进各个 Jinja2 环境的缓存（每个路由各有一个环境）"""
+    count = 0
+    for templates in all_templates:
+        env = templates.env
+        for name in env.list_templates(extensions=["html"]):
+            env.get_template(name)
+            count += 1
+    return count
+
+
+def warm_up(all_templates: Iterable[Jinja2Templates], started: float) -> dict:
+    """依次加载目录、索引和模板；已经预热过（例如主进程预热后 fork 出来的 worker）就直接返回"""
+    if STATE["ready"]:
+        return STATE
+    try:
+        for name, load in WARMUP_STEPS:
+            t = time.perf_counter()
+            load()
+            STATE["steps"][name] = round(time.perf_counter() - t, 3)
+        t = time.perf_counter()
+        compile_templates(all_templates)
+        STATE["steps"]["templates"] = round(time.perf_counter() - t, 3)
+    except Exception as e:
+        STATE["error"] = repr(e)
+        print(f"预热失败: {e!r}")
+        raise
+    STATE["import_to_ready"] = round(time.perf_counter() - started, 3)
+    STATE["ready"] = True
+    print(f"预热完成，从导入到就绪用时 {STATE['import_to_ready']:.3f} 秒: {STATE['steps']}")
+    return STATE
+
+
+def reset() -> dict:
+    """清空已加载的目录和索引，下次预热时重新从磁盘读取（多进程模式下主进程收到 SIGHUP 时调用）
+
+    旧数据不会马上丢掉，而是返回给调用方：新数据加载成功后调用 release()，失败则调用 restore() 换回来。
+    """
+    old = {
+        "globals": [getattr(module, name) for module, name in LOADED_GLOBALS],
+        "corpora": reset_corpora(close=False),
+        "state": dict(STATE, steps=dict(STATE["steps"])),
+    }
+    for module, name in LOADED_GLOBALS:
+        setattr(module, name, None)
+    STATE.update(ready=False, error=None, steps={}, import_to_ready=None)
+    return old
+
+
+def restore(old: dict):
+    """新数据加载失败，换回 reset() 之前的数据，加载了一半的新数据丢掉"""
+    for (module, name), value in zip(LOADED_GLOBALS, old["globals"]):
+        setattr(module, name, value)
+    restore_corpora(old["corpora"])
+    STATE.clear()
+    STATE.update(old["state"])
+    gc.collect()
+
+
+def release(old: dict):
+    """新数据已就绪，关闭旧的语料包并回收旧数据"""
+    for corpus in old["corpora"].values():
+        corpus.close()
+    old.clear()
+    # 旧数据在上次预热后被 freeze 了，先解冻才能回收
+    gc.unfreeze()
+    gc.collect()